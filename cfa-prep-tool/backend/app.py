@@ -2,11 +2,16 @@
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
 import os
+import re
+import json
+import asyncio
+import shutil
+import fitz
 from datetime import datetime
 
 # Import database and models
@@ -17,7 +22,16 @@ from models import Flashcard, QuizQuestion, StudySession, LearningProgress
 from services.flashcard_service import FlashcardService
 from services.quiz_service import QuizService
 from services.progress_service import ProgressService
-from content_analyzer_hybrid import HybridContentAnalyzer as ContentAnalyzer
+from services.content_service import ContentService
+from content_analyzer_hybrid import (HybridContentAnalyzer as ContentAnalyzer, Deadline,
+                                     DeadlineExceeded, default_deadline_seconds)
+from extraction_store import ExtractionReader, JSONL_SUFFIX, find_extraction, load_extraction
+from extraction_jobs import ExtractionJobManager
+from batch_process_pdfs import LEVELS
+from pdf_watcher import PdfFolderWatcher
+from model_registry import ModelRegistry
+from llm_cache import ResponseCache
+from generation_queue import GenerationQueue, store_bundle
 
 # Initialize FastAPI app
 app = FastAPI(title="CFA Prep Tool", version="1.0.0")
@@ -33,13 +47,84 @@ app.add_middleware(
 
 # Mount static files
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
+extracted_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "extracted")
+pdfs_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "pdfs")
 app.mount("/static", StaticFiles(directory=os.path.join(frontend_path, "static")), name="static")
 
+# Background extraction of uploaded PDFs (worker processes start on first upload)
+extraction_jobs = ExtractionJobManager(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    workers=int(os.getenv("EXTRACTION_WORKERS", "1"))
+)
+
+# One analyzer per process; Ollama's model list is refreshed in the background
+model_registry = ModelRegistry(os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"),
+                               ttl=float(os.getenv("MODEL_REFRESH_SECONDS", "60")))
+analyzer = ContentAnalyzer(registry=model_registry)
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """On-disk cache answering repeated generations for the same prompt.
+
+    Built on startup rather than at import, so importing the app does not
+    create data/llm_cache.db. Returns None when LLM_CACHE=false.
+    """
+    if os.getenv("LLM_CACHE", "true").lower() != "true":
+        return None
+    return ResponseCache(
+        os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "llm_cache.db")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "50")) * 1024 * 1024)
+    )
+
+def get_analyzer() -> ContentAnalyzer:
+    """Dependency returning the shared content analyzer."""
+    return analyzer
+
+# Queued generation jobs; size the pool to the requests Ollama runs in parallel
+generation_queue = GenerationQueue(
+    SessionLocal, analyzer,
+    workers=int(os.getenv("GENERATION_WORKERS", "1")),
+    max_attempts=int(os.getenv("GENERATION_MAX_ATTEMPTS", "3")),
+    retry_delay=float(os.getenv("GENERATION_RETRY_DELAY", "5")),
+    lease_seconds=float(os.getenv("GENERATION_LEASE_SECONDS", "60"))
+)
+
+def get_generation_queue() -> GenerationQueue:
+    """Dependency returning the shared generation job queue."""
+    return generation_queue
+
+# Optionally watch pdfs/levelN and queue new or changed volumes automatically
+watch_pdfs = os.getenv("WATCH_PDFS", "false").lower() == "true"
+pdf_watcher_stop = None
+
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
+    global pdf_watcher_stop
     init_db()
     print("Database initialized successfully")
+    if analyzer.cache is None:
+        analyzer.cache = build_response_cache()
+    model_registry.start()
+    generation_queue.start()
+    if watch_pdfs:
+        watcher = PdfFolderWatcher(pdfs_path, LEVELS,
+                                   interval=float(os.getenv("WATCH_INTERVAL", "5")))
+        pdf_watcher_stop = watcher.start(extraction_jobs.submit_changed)
+        print(f"Watching {pdfs_path} for new PDFs")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if pdf_watcher_stop:
+        pdf_watcher_stop.set()
+    model_registry.stop()
+    await asyncio.to_thread(generation_queue.shutdown)
+    await analyzer.aclose()
+    if analyzer.cache is not None:
+        analyzer.cache.close()
+        analyzer.cache = None
+    extraction_jobs.shutdown()
 
 # Pydantic models for request/response
 class FlashcardCreate(BaseModel):
@@ -65,6 +150,15 @@ class GenerateContentRequest(BaseModel):
     level: str
     flashcard_count: Optional[int] = 10
     question_count: Optional[int] = 5
+    # Time budget for the whole request; GENERATION_DEADLINE seconds if omitted
+    deadline_seconds: Optional[float] = None
+
+    def deadline(self) -> Deadline:
+        return Deadline(self.deadline_seconds or default_deadline_seconds())
+
+class GenerationJobRequest(GenerateContentRequest):
+    kind: str = "bundle"  # flashcards, quiz or bundle
+    priority: str = "bulk"  # interactive jobs run before bulk ones
 
 class StudySessionStart(BaseModel):
     session_type: str
@@ -268,45 +362,290 @@ def end_study_session(session: StudySessionEnd, db: Session = Depends(get_db)):
         "ended_at": result.ended_at.isoformat()
     }
 
+# ============= Source Content Endpoints =============
+
+@app.get("/api/content")
+def get_source_content(level: Optional[str] = None, volume: Optional[int] = None,
+                       content_type: Optional[str] = None, topic: Optional[str] = None,
+                       limit: int = 50, offset: int = 0, db: Session = Depends(get_db)):
+    """Get extracted PDF sections and formulas with optional filters."""
+    service = ContentService(db)
+    items = service.get_content(level, volume, content_type, topic, limit, offset)
+    return {"content": [
+        {
+            "id": c.id,
+            "level": c.level,
+            "volume": c.volume,
+            "topic": c.topic,
+            "content_type": c.content_type,
+            "page_number": c.page_number,
+            "content": c.content
+        } for c in items
+    ]}
+
+@app.get("/api/content/volumes")
+def get_content_volumes(db: Session = Depends(get_db)):
+    """Get the ingested volumes with section and formula counts."""
+    service = ContentService(db)
+    return {"volumes": service.get_volumes()}
+
+@app.get("/api/content/extracted/{level}/{volume}/sections")
+def get_extracted_sections(level: str, volume: int, start: int = 0, limit: int = 10):
+    """Read sections straight from an extraction file, seeking when it is JSONL."""
+    path = find_extraction(extracted_path, level, volume)
+    if not path:
+        raise HTTPException(status_code=404, detail=f"No extraction found for {level} V{volume}")
+
+    if path.endswith(JSONL_SUFFIX):
+        reader = ExtractionReader(path)
+        total = reader.section_count
+        sections = []
+        for section in reader.iter_sections(start):
+            if len(sections) >= limit:
+                break
+            section.pop("type")
+            sections.append(section)
+    else:
+        all_sections = load_extraction(path)["sections"]
+        total = len(all_sections)
+        sections = all_sections[start:start + limit]
+
+    return {"total": total, "start": start, "sections": sections}
+
+@app.post("/api/content/upload", status_code=202)
+def upload_pdf(file: UploadFile = File(...)):
+    """Save a CFA volume PDF under pdfs/levelN and queue it for extraction."""
+    filename = os.path.basename(file.filename or "")
+    match = re.search(r'CFA L(\d) \(V(\d+)\)', filename)
+    if not filename.lower().endswith(".pdf") or not match:
+        raise HTTPException(status_code=400,
+                            detail='Expected a PDF named like "CFA L1 (V1).pdf"')
+    folder = f"level{match.group(1)}"
+    if folder not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unknown level in {filename}")
+
+    level_dir = os.path.join(pdfs_path, folder)
+    os.makedirs(level_dir, exist_ok=True)
+    pdf_path = os.path.join(level_dir, filename)
+    tmp_path = f"{pdf_path}.upload"
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(file.file, f, length=1 << 20)
+
+    # Only replace an existing volume with a file fitz can open
+    try:
+        with fitz.open(tmp_path, filetype="pdf"):
+            pass
+    except RuntimeError as e:
+        os.remove(tmp_path)
+        raise HTTPException(status_code=400, detail=f"Could not open {filename}: {e}")
+    os.replace(tmp_path, pdf_path)
+
+    job = extraction_jobs.submit(pdf_path)
+    return {"message": "Extraction queued", "job": job}
+
+@app.get("/api/content/jobs")
+def get_extraction_jobs():
+    """List upload extraction jobs, newest first."""
+    return {"jobs": extraction_jobs.list_jobs()}
+
+@app.get("/api/content/jobs/{job_id}")
+def get_extraction_job(job_id: str):
+    """Get an extraction job's status, pages processed and ETA."""
+    job = extraction_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# ============= Formula Endpoints =============
+
+@app.get("/api/formulas")
+def search_formulas(symbol: Optional[str] = None, level: Optional[str] = None,
+                    volume: Optional[int] = None, page: Optional[int] = None,
+                    limit: int = 50, db: Session = Depends(get_db)):
+    """Look up deduplicated formulas by symbol (or concept, e.g. "duration"), level, volume and page."""
+    index = ContentService(db).get_formula_index()
+    formulas = index.search(symbol, level, volume, page, limit)
+    return {"total_unique": len(index), "count": len(formulas), "formulas": formulas}
+
+@app.get("/api/formulas/symbols")
+def get_formula_symbols(limit: int = 50, db: Session = Depends(get_db)):
+    """Get the most common formula symbols."""
+    return {"symbols": ContentService(db).get_formula_index().top_symbols(limit)}
+
 # ============= Content Generation Endpoints =============
 
 @app.post("/api/generate/flashcards")
-def generate_flashcards(request: GenerateContentRequest, db: Session = Depends(get_db)):
-    """Generate flashcards from content using Claude AI."""
+async def generate_flashcards(request: GenerateContentRequest, db: Session = Depends(get_db),
+                             analyzer: ContentAnalyzer = Depends(get_analyzer)):
+    """Generate flashcards from content using Claude AI.
+
+    Returns what finished within the deadline (``partial`` is true if some
+    chunks ran out of time), or 504 if nothing did.
+    """
+    deadline = request.deadline()
     try:
-        analyzer = ContentAnalyzer()
         service = FlashcardService(db, analyzer)
-        flashcards = service.create_flashcards_from_content(
+        flashcards = await service.acreate_flashcards_from_content(
             request.content,
             request.topic,
             request.level,
-            request.flashcard_count
+            request.flashcard_count,
+            deadline
         )
         return {
             "message": f"Generated {len(flashcards)} flashcards",
-            "count": len(flashcards)
+            "count": len(flashcards),
+            "partial": deadline.cut_short
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
 
 @app.post("/api/generate/quiz")
-def generate_quiz(request: GenerateContentRequest, db: Session = Depends(get_db)):
-    """Generate quiz questions from content using Claude AI."""
+async def generate_quiz(request: GenerateContentRequest, db: Session = Depends(get_db),
+                        analyzer: ContentAnalyzer = Depends(get_analyzer)):
+    """Generate quiz questions from content using Claude AI (deadline as for flashcards)."""
+    deadline = request.deadline()
     try:
-        analyzer = ContentAnalyzer()
         service = QuizService(db, analyzer)
-        questions = service.create_quiz_from_content(
+        questions = await service.acreate_quiz_from_content(
             request.content,
             request.topic,
             request.level,
-            request.question_count
+            request.question_count,
+            deadline
         )
         return {
             "message": f"Generated {len(questions)} questions",
-            "count": len(questions)
+            "count": len(questions),
+            "partial": deadline.cut_short
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/api/generate/bundle")
+async def generate_bundle(request: GenerateContentRequest, db: Session = Depends(get_db),
+                          analyzer: ContentAnalyzer = Depends(get_analyzer)):
+    """Generate flashcards, quiz questions and key concepts in one model pass.
+
+    Cheaper than calling the flashcard and quiz endpoints separately: the
+    model reads the content once. Concepts are returned, not stored.
+    """
+    deadline = request.deadline()
+    try:
+        bundle = await analyzer.agenerate_bundle(
+            request.content,
+            request.topic,
+            request.level,
+            request.flashcard_count,
+            request.question_count,
+            deadline
+        )
+        stored = await asyncio.to_thread(store_bundle, db, bundle)
+        return {
+            "message": f"Generated {stored['flashcard_count']} flashcards and {stored['question_count']} questions",
+            **stored,
+            "partial": deadline.cut_short
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+@app.post("/api/generate/jobs", status_code=202)
+def submit_generation_job(request: GenerationJobRequest,
+                          queue: GenerationQueue = Depends(get_generation_queue)):
+    """Queue a flashcard, quiz or bundle generation; poll the returned job for the result.
+
+    The worker pool caps how many generations reach the model at once;
+    interactive jobs jump ahead of bulk ones, and failed jobs are retried.
+    """
+    try:
+        job = queue.submit(request.kind, request.content, request.topic, request.level,
+                           priority=request.priority,
+                           flashcard_count=request.flashcard_count,
+                           question_count=request.question_count,
+                           deadline_seconds=request.deadline_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Generation queued", "job": job}
+
+@app.get("/api/generate/jobs")
+def get_generation_jobs(status: Optional[str] = None, limit: int = 50,
+                        queue: GenerationQueue = Depends(get_generation_queue)):
+    """List generation jobs, newest first, with the number of jobs per status."""
+    return {"jobs": queue.list_jobs(status, limit), "counts": queue.counts(), "workers": queue.workers}
+
+@app.get("/api/generate/jobs/{job_id}")
+def get_generation_job(job_id: int, queue: GenerationQueue = Depends(get_generation_queue)):
+    """Get a generation job's status, queue position, attempts and result."""
+    job = queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _stream_generation(kind: str, make_stream, describe, deadline: Deadline) -> StreamingResponse:
+    """Stream stored items as SSE: ``item`` per insert, then ``done`` or ``error``.
+
+    The response outlives the request's dependency scope, so the stream
+    opens its own database session. When the deadline cuts generation
+    short, ``done`` carries ``partial: true``; if nothing was produced an
+    ``error`` with ``timeout: true`` is sent.
+    """
+    async def events():
+        db = SessionLocal()
+        count = 0
+        try:
+            try:
+                async for item in make_stream(db):
+                    count += 1
+                    yield _sse("item", dict(describe(item), count=count))
+            except DeadlineExceeded as e:
+                if not count:
+                    yield _sse("error", {"count": 0, "detail": str(e), "timeout": True})
+                    return
+            yield _sse("done", {"count": count, "message": f"Generated {count} {kind}",
+                                "partial": deadline.cut_short})
+        except Exception as e:
+            yield _sse("error", {"count": count, "detail": str(e)})
+        finally:
+            db.close()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/api/generate/flashcards/stream")
+async def stream_flashcards(request: GenerateContentRequest,
+                            analyzer: ContentAnalyzer = Depends(get_analyzer)):
+    """Generate flashcards, storing and reporting each one as it is produced (SSE)."""
+    deadline = request.deadline()
+    return _stream_generation(
+        "flashcards",
+        lambda db: FlashcardService(db, analyzer).astream_flashcards_from_content(
+            request.content, request.topic, request.level, request.flashcard_count, deadline),
+        lambda card: {"id": card.id, "front": card.front},
+        deadline
+    )
+
+@app.post("/api/generate/quiz/stream")
+async def stream_quiz(request: GenerateContentRequest,
+                      analyzer: ContentAnalyzer = Depends(get_analyzer)):
+    """Generate quiz questions, storing and reporting each one as it is produced (SSE)."""
+    deadline = request.deadline()
+    return _stream_generation(
+        "questions",
+        lambda db: QuizService(db, analyzer).astream_quiz_from_content(
+            request.content, request.topic, request.level, request.question_count, deadline),
+        lambda question: {"id": question.id, "question": question.question},
+        deadline
+    )
 
 # ============= Utility Endpoints =============
 
@@ -326,6 +665,29 @@ def get_available_topics(db: Session = Depends(get_db)):
 
     return {"topics": topics_by_level}
 
+@app.get("/api/models")
+def get_models():
+    """Get the cached Ollama model list and generation usage statistics."""
+    return {
+        "registry": model_registry.snapshot(),
+        "finance_llm_model": analyzer.finance_llm_model,
+        "finance_llm_available": analyzer.finance_llm_available,
+        "statistics": analyzer.get_statistics()
+    }
+
+@app.get("/api/models/health")
+def get_model_health():
+    """Circuit breaker state and latency/error averages per model."""
+    return {"models": analyzer.health.snapshot(), "fallback_models": analyzer.fallback_models}
+
+@app.delete("/api/generate/cache")
+def clear_generation_cache():
+    """Drop all cached model replies."""
+    if analyzer.cache is None:
+        raise HTTPException(status_code=404, detail="Response cache is disabled")
+    analyzer.cache.clear()
+    return {"message": "Generation cache cleared"}
+
 @app.get("/api/health")
 def health_check():
     """Health check endpoint."""
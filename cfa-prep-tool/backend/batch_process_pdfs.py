@@ -1,26 +1,141 @@
 """Batch PDF processor for organized CFA materials."""
 import os
 import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.dirname(__file__))
 
-from pdf_extractor import CFAPDFExtractor
+from pdf_extractor import CFAPDFExtractor, file_sha256
+from extraction_store import load_extraction
+from page_cache import PageTextCache
+from extraction_checkpoint import CheckpointStore
+from pdf_watcher import PdfFolderWatcher, DEFAULT_INTERVAL, DEFAULT_DEBOUNCE
+from extraction_manifest import (
+    ExtractionManifest, MANIFEST_FILENAME, NEW, CHANGED, UNCHANGED, DUPLICATE, summarize_result
+)
+from database import SessionLocal, init_db
+from services.content_service import ContentService
 
-def process_all_levels():
-    """Process all PDFs organized by level."""
+LEVELS = {
+    "level1": "L1",
+    "level2": "L2",
+    "level3": "L3"
+}
 
-    base_dir = os.path.dirname(os.path.dirname(__file__))
+def _process_one(level_dir: str, output_dir: str, pdf_file: str, shards: int = 1,
+                 output_format: str = "json", cache_dir: str = None, pdf_hash: str = None,
+                 progress=None, checkpoint_dir: str = None, resume: bool = False):
+    """Extract a single PDF. Runs inside a pool worker when --workers > 1."""
+    started = time.perf_counter()
+    extractor = CFAPDFExtractor(level_dir, output_dir, shards=shards,
+                                output_format=output_format,
+                                page_cache=PageTextCache(cache_dir) if cache_dir else None,
+                                checkpoints=CheckpointStore(checkpoint_dir) if checkpoint_dir else None,
+                                resume=resume)
+    result = extractor.process_pdf(pdf_file, pdf_hash=pdf_hash, progress=progress)
+    return result, time.perf_counter() - started
+
+def _collect_jobs(pdf_base: str):
+    """List (folder, level_code, level_dir, pdf_file) jobs in a stable order."""
+    jobs = []
+    for folder, level_code in LEVELS.items():
+        level_dir = os.path.join(pdf_base, folder)
+
+        if not os.path.exists(level_dir):
+            print(f"⚠️  Skipping {folder} - directory not found")
+            continue
+
+        # Get all PDFs in this level
+        pdf_files = sorted([f for f in os.listdir(level_dir) if f.endswith('.pdf')])
+
+        if not pdf_files:
+            print(f"  No PDFs found in {folder}/")
+            continue
+
+        print(f"📚 {level_code}: found {len(pdf_files)} PDFs in {folder}/")
+        for pdf_file in pdf_files:
+            jobs.append((folder, level_code, level_dir, pdf_file))
+    return jobs
+
+def _report_file(pdf_file: str, summary, elapsed: float, skipped: bool = False,
+                 cached: bool = False):
+    """Print the per-file outcome line block."""
+    if skipped:
+        print(f"\n  {pdf_file} (unchanged, skipped)")
+    elif cached:
+        print(f"\n  {pdf_file} ({elapsed:.2f}s, re-scanned from page cache)")
+    else:
+        print(f"\n  {pdf_file} ({elapsed:.1f}s)")
+    if summary:
+        print(f"    ✓ {summary['total_pages']} pages")
+        print(f"    ✓ {summary['section_count']} sections")
+        print(f"    ✓ {summary['formula_count']} formulas")
+    else:
+        print(f"    ✗ Failed to process")
+
+def _ingest_content(results, skipped_entries, base_dir: str):
+    """Load fresh results, plus skipped volumes missing from the DB, into cfa_content."""
+    init_db()
+    db = SessionLocal()
+    try:
+        service = ContentService(db)
+        to_ingest = list(results)
+        for entry in skipped_entries:
+            summary = entry["summary"]
+            if not service.has_volume(summary["level"], summary["volume"]):
+                to_ingest.append(load_extraction(os.path.join(base_dir, entry["output"])))
+        if not to_ingest:
+            print("\n🗄️  Database already up to date")
+            return
+        counts = service.ingest_extracted(to_ingest)
+        print(f"\n🗄️  Loaded {counts['sections']:,} sections and {counts['formulas']:,} formulas "
+              f"from {counts['volumes']} volumes into cfa_content")
+        if counts["duplicates"]:
+            print(f"    (skipped {counts['duplicates']:,} near-duplicate sections)")
+    except Exception as e:
+        print(f"\n⚠️  Database ingestion failed: {e}")
+    finally:
+        db.close()
+
+def process_all_levels(workers: int = 1, shards: int = 1, force: bool = False,
+                       ingest: bool = True, output_format: str = "json",
+                       use_page_cache: bool = True, base_dir: str = None,
+                       resume: bool = False):
+    """Process all PDFs organized by level.
+
+    With ``workers > 1`` files are extracted in a process pool. Results are
+    always returned in the same (level, filename) order as a serial run.
+    ``shards > 1`` additionally splits each large volume into page ranges.
+
+    PDFs whose hash, size, mtime and extractor version match the manifest in
+    ``data/`` are skipped unless ``force`` is set, and a PDF with the same
+    content hash as an earlier file (the same volume saved twice) is never
+    extracted. Returns one summary dict (see ``summarize_result``) per PDF,
+    extracted or skipped as unchanged.
+
+    ``output_format`` is ``json`` (one pretty-printed file per volume) or
+    ``jsonl`` (compressed records plus an offset index, see extraction_store).
+    Raw page text is cached under ``data/page_cache`` (unless
+    ``use_page_cache`` is off), so files that only need their section or
+    formula rules re-applied are re-scanned without re-parsing the PDF.
+    Volumes save a checkpoint to ``data/checkpoints`` every few pages; with
+    ``resume`` an interrupted volume continues from its checkpoint instead
+    of page one (finished volumes are skipped through the manifest anyway).
+    ``base_dir`` defaults to the cfa-prep-tool directory; PDFs are read from
+    its ``pdfs/levelN`` folders and outputs go to its ``data`` folder.
+    With ``ingest`` the extracted sections and formulas are bulk-loaded
+    into the ``cfa_content`` table once all workers have finished.
+    """
+
+    base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     pdf_base = os.path.join(base_dir, "pdfs")
     output_dir = os.path.join(base_dir, "data", "extracted")
+    cache_dir = os.path.join(base_dir, "data", "page_cache") if use_page_cache else None
 
     # Create output directory
     os.makedirs(output_dir, exist_ok=True)
 
-    levels = {
-        "level1": "L1",
-        "level2": "L2",
-        "level3": "L3"
-    }
-
     all_results = []
 
     print("=" * 70)
@@ -28,41 +143,110 @@ def process_all_levels():
     print("=" * 70)
     print()
 
-    for folder, level_code in levels.items():
-        level_dir = os.path.join(pdf_base, folder)
+    manifest = ExtractionManifest(os.path.join(base_dir, "data", MANIFEST_FILENAME), base_dir)
+    batch_started = time.perf_counter()
 
-        if not os.path.exists(level_dir):
-            print(f"⚠️  Skipping {folder} - directory not found")
-            continue
+    all_jobs = _collect_jobs(pdf_base)
+    jobs = []
+    skipped = {}
+    duplicates = {}
+    known_hashes = {}
+    first_by_hash = {}
+    for job in all_jobs:
+        _, _, level_dir, pdf_file = job
+        pdf_path = os.path.join(level_dir, pdf_file)
+        status = manifest.check(pdf_path, output_format)
 
-        print(f"\n📚 Processing {level_code} PDFs from {folder}/")
-        print("-" * 70)
+        # Exact duplicate files: new content is hashed here (once, and passed
+        # on to the worker); known content reuses the manifest hash
+        if status in (NEW, CHANGED):
+            known_hashes[pdf_path] = file_sha256(pdf_path)
+        else:
+            known_hashes[pdf_path] = manifest.get(pdf_path)["sha256"]
+        original = first_by_hash.setdefault(known_hashes[pdf_path], pdf_path)
+        if original != pdf_path:
+            duplicates[pdf_path] = os.path.basename(original)
+            manifest.record_duplicate(pdf_path, known_hashes[pdf_path], original)
+            continue
+        if status == DUPLICATE:
+            # The file it copied is gone or changed: extract this one instead
+            status = NEW
 
-        # Get all PDFs in this level
-        pdf_files = sorted([f for f in os.listdir(level_dir) if f.endswith('.pdf')])
+        if status == UNCHANGED and not force:
+            skipped[pdf_path] = manifest.get(pdf_path)["summary"]
+        else:
+            if status != UNCHANGED:
+                print(f"  {pdf_file}: {status.replace('_', ' ')}")
+            jobs.append(job)
 
-        if not pdf_files:
-            print(f"  No PDFs found in {folder}/")
-            continue
+    checkpoint_dir = os.path.join(base_dir, "data", "checkpoints")
 
-        print(f"  Found {len(pdf_files)} PDFs")
+    def run_jobs():
+        """Yield (job, (result, elapsed)) in job order as files complete."""
+        if not jobs:
+            return
+        if workers > 1 and len(jobs) > 1:
+            print(f"\n⚙️  Processing {len(jobs)} PDFs with {workers} workers")
+            print("-" * 70)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_process_one, level_dir, output_dir, pdf_file, shards,
+                                    output_format, cache_dir,
+                                    known_hashes.get(os.path.join(level_dir, pdf_file)),
+                                    checkpoint_dir=checkpoint_dir, resume=resume)
+                    for _, _, level_dir, pdf_file in jobs
+                ]
+                # Collect in submission order so output is deterministic
+                for job, future in zip(jobs, futures):
+                    try:
+                        yield job, future.result()
+                    except Exception as e:
+                        print(f"    ✗ Worker error on {job[3]}: {e}")
+                        yield job, (None, 0.0)
+        else:
+            print(f"\n⚙️  Processing {len(jobs)} PDFs serially")
+            print("-" * 70)
+            for job in jobs:
+                _, _, level_dir, pdf_file = job
+                yield job, _process_one(level_dir, output_dir, pdf_file, shards, output_format,
+                                        cache_dir, known_hashes.get(os.path.join(level_dir, pdf_file)),
+                                        checkpoint_dir=checkpoint_dir, resume=resume)
 
-        # Process each PDF
-        for pdf_file in pdf_files:
+    file_times = []
+    extracted = {}
+    fresh_results = []
+    for (_, _, level_dir, pdf_file), (result, elapsed) in run_jobs():
+        file_times.append(elapsed)
+        if result:
             pdf_path = os.path.join(level_dir, pdf_file)
+            output_path = os.path.join(
+                output_dir,
+                CFAPDFExtractor.output_filename(result['level'], result['volume'], output_format))
+            manifest.record(pdf_path, result, output_path, sha256=result.get('source_sha256'))
+            # Saved per file, so a killed run keeps every volume it finished
+            manifest.save()
+            extracted[pdf_path] = (summarize_result(result), elapsed,
+                                   result.get('text_source') == "page_cache")
+            fresh_results.append(result)
+        else:
+            extracted[os.path.join(level_dir, pdf_file)] = (None, elapsed, False)
+    manifest.save()
 
-            print(f"\n  Processing: {pdf_file}")
-
-            extractor = CFAPDFExtractor(level_dir, output_dir)
-            result = extractor.process_pdf(pdf_file)
+    # Report every file in stable order, skipped ones included
+    for _, _, level_dir, pdf_file in all_jobs:
+        pdf_path = os.path.join(level_dir, pdf_file)
+        if pdf_path in duplicates:
+            print(f"\n  {pdf_file} (duplicate of {duplicates[pdf_path]}, skipped)")
+        elif pdf_path in skipped:
+            _report_file(pdf_file, skipped[pdf_path], 0.0, skipped=True)
+            all_results.append(skipped[pdf_path])
+        elif pdf_path in extracted:
+            summary, elapsed, cached = extracted[pdf_path]
+            _report_file(pdf_file, summary, elapsed, cached=cached)
+            if summary:
+                all_results.append(summary)
 
-            if result:
-                all_results.append(result)
-                print(f"    ✓ {result['total_pages']} pages")
-                print(f"    ✓ {len(result['sections'])} sections")
-                print(f"    ✓ {len(result['formulas'])} formulas")
-            else:
-                print(f"    ✗ Failed to process")
+    wall_time = time.perf_counter() - batch_started
 
     # Summary
     print("\n" + "=" * 70)
@@ -71,11 +255,13 @@ def process_all_levels():
 
     if all_results:
         total_pages = sum(r['total_pages'] for r in all_results)
-        total_sections = sum(len(r['sections']) for r in all_results)
-        total_formulas = sum(len(r['formulas']) for r in all_results)
+        total_sections = sum(r['section_count'] for r in all_results)
+        total_formulas = sum(r['formula_count'] for r in all_results)
 
         print(f"\n📊 Summary:")
-        print(f"  • PDFs processed: {len(all_results)}")
+        print(f"  • PDFs processed: {len(all_results)} ({len(skipped)} unchanged, skipped)")
+        if duplicates:
+            print(f"  • Duplicate files skipped: {len(duplicates)}")
         print(f"  • Total pages: {total_pages:,}")
         print(f"  • Sections extracted: {total_sections:,}")
         print(f"  • Formulas found: {total_formulas:,}")
@@ -88,16 +274,81 @@ def process_all_levels():
                 pages = sum(r['total_pages'] for r in level_pdfs)
                 print(f"  • {level_code}: {len(level_pdfs)} PDFs, {pages:,} pages")
 
+        # Scaling: summed per-file time vs. wall clock
+        cpu_time = sum(file_times)
+        print(f"\n⏱️  Timing:")
+        print(f"  • Wall time: {wall_time:.1f}s ({workers} worker{'s' if workers != 1 else ''})")
+        print(f"  • Sum of per-file times: {cpu_time:.1f}s")
+        if wall_time > 0 and file_times:
+            print(f"  • Effective speedup: {cpu_time / wall_time:.2f}x")
+            print(f"  • Throughput: {total_pages / wall_time:,.0f} pages/s")
+
         print(f"\n💾 Extracted data saved to: {output_dir}")
 
+        if ingest:
+            _ingest_content(fresh_results, [manifest.get(path) for path in skipped], base_dir)
+
     else:
         print("\n⚠️  No PDFs were successfully processed")
 
     print()
     return all_results
 
+def watch_levels(interval: float = DEFAULT_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+                 base_dir: str = None, **options):
+    """Re-run the incremental batch whenever PDFs under pdfs/levelN settle.
+
+    Each run goes through the manifest, so only new or changed files are
+    extracted and loaded into the database. Stops on Ctrl+C.
+    """
+    base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    watcher = PdfFolderWatcher(os.path.join(base_dir, "pdfs"), LEVELS, interval, debounce)
+    watcher.prime()
+
+    def on_ready(paths):
+        print(f"\n📥 Detected {len(paths)} new or changed PDF(s): "
+              f"{', '.join(os.path.basename(p) for p in paths)}")
+        process_all_levels(base_dir=base_dir, **options)
+
+    print(f"👀 Watching {os.path.join(base_dir, 'pdfs')} every {interval:g}s (Ctrl+C to stop)")
+    try:
+        watcher.run(on_ready)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+def parse_args(argv=None):
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Extract all CFA PDFs under pdfs/levelN/")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1, serial)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract every PDF even if the manifest says it is unchanged")
+    parser.add_argument("--no-db", action="store_true",
+                        help="Only write JSON files; skip loading content into the database")
+    parser.add_argument("--format", choices=["json", "jsonl"], default="json",
+                        help="Output format: pretty JSON or compressed JSONL with an offset index")
+    parser.add_argument("--no-page-cache", action="store_true",
+                        help="Do not read or write the per-page text cache in data/page_cache")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue interrupted volumes from their last checkpoint")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="Page-range shards per PDF for large volumes (default: 1)")
+    parser.add_argument("--watch", action="store_true",
+                        help="After the initial run, keep polling pdfs/levelN and process new files")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between folder polls in --watch mode (default: {DEFAULT_INTERVAL:g})")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    results = process_all_levels()
+    args = parse_args()
+    options = dict(workers=max(1, args.workers), shards=max(1, args.shards),
+                   ingest=not args.no_db, output_format=args.format,
+                   use_page_cache=not args.no_page_cache, resume=args.resume)
+    results = process_all_levels(force=args.force, **options)
+
+    if args.watch:
+        watch_levels(interval=args.interval, **options)
+        sys.exit(0)
 
     if results:
         print("✅ All PDFs processed successfully!")
@@ -0,0 +1,184 @@
+"""Extraction throughput benchmark using synthetic CFA-style PDFs.
+
+Generates PDFs of configurable size with reading headers, formulas and an
+outline, then measures:
+
+* per-stage timing of ``CFAPDFExtractor`` (text, sections, formulas,
+  serialization) plus end-to-end ``process_pdf``
+* the batch path (``process_all_levels``) over several files and workers
+* pages/sec and peak RSS of this process and its worker processes
+
+Example:
+    python benchmark_extraction.py --pages 800 --files 3 --workers 2
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import contextlib
+sys.path.append(os.path.dirname(__file__))
+
+import fitz  # PyMuPDF
+
+from pdf_extractor import CFAPDFExtractor, ExtractionScanner, iter_page_lines
+from extraction_store import write_extraction
+from batch_process_pdfs import process_all_levels
+
+WORDS = ("portfolio return risk bond equity duration yield coupon discount rate "
+         "investor asset liability valuation forward swap option hedge credit").split()
+
+FORMULAS = [
+    "PV = FV / (1 + r)^n",
+    "FV = PV * (1 + r)^n",
+    "YTM = (C + (F - P) / n) / ((F + P) / 2)",
+    "ModDur = MacDur / (1 + r)",
+    "Sharpe = (Rp - Rf) / sigma",
+]
+
+def make_synthetic_pdf(path: str, pages: int, pages_per_reading: int = 12,
+                       seed: int = 0) -> None:
+    """Write a synthetic volume with readings, subsections, formulas and a TOC."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    toc = []
+    for i in range(pages):
+        page = doc.new_page()
+        lines = []
+        if i % pages_per_reading == 0:
+            reading = i // pages_per_reading + 1
+            toc.append([1, f"Reading {reading}", i + 1])
+            lines.append(f"READING {reading}")
+            lines.append("LEARNING OUTCOME STATEMENTS")
+        elif i % 4 == 0:
+            title = f"Section {i}: {rng.choice(WORDS).title()} Analysis"
+            toc.append([2, title, i + 1])
+            lines.append(title.upper())
+        for n in range(40):
+            if n % 15 == 7:
+                lines.append(rng.choice(FORMULAS))
+            else:
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+        page.insert_text((50, 50), "\n".join(lines), fontsize=8)
+    doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of reaped children, in MB."""
+    to_mb = 1024 if sys.platform != "darwin" else 1024 * 1024  # KB on Linux, bytes on macOS
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / to_mb,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / to_mb
+    }
+
+@contextlib.contextmanager
+def timed(timings: dict, name: str):
+    started = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - started
+
+class _SectionsOnlyScanner(ExtractionScanner):
+    def is_formula(self, line: str) -> bool:
+        return False
+
+def bench_stages(pdf_dir: str, pdf_file: str, shards: int) -> dict:
+    """Time each extraction stage separately, then the combined process_pdf."""
+    extractor = CFAPDFExtractor(pdf_dir, os.path.join(pdf_dir, "out"), shards=shards)
+    pdf_path = os.path.join(pdf_dir, pdf_file)
+    timings = {}
+
+    with timed(timings, "text"):
+        toc = extractor.read_toc(pdf_path)
+        pages = list(extractor.iter_pages(pdf_path))
+    lines = list(iter_page_lines(pages))
+
+    with timed(timings, "sections"):
+        sections, _ = _SectionsOnlyScanner(toc=toc).feed_lines(lines).finish()
+
+    scanner = ExtractionScanner()
+    with timed(timings, "formulas"):
+        formulas = [line for _, line in lines if scanner.is_formula(line)]
+
+    data = {"filename": pdf_file, "level": "L1", "volume": 1,
+            "total_pages": len(pages), "sections": sections,
+            "formulas": [{"formula": f, "page": None} for f in formulas],
+            "pages": pages[:5]}
+    with timed(timings, "serialize_json"):
+        with open(os.path.join(pdf_dir, "out", "bench.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    with timed(timings, "serialize_jsonl"):
+        write_extraction(data, os.path.join(pdf_dir, "out", "bench.jsonl.gz"))
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        with timed(timings, "process_pdf"):
+            result = extractor.process_pdf(pdf_file)
+
+    return {
+        "pages": len(pages),
+        "sections": len(result["sections"]),
+        "formulas": len(result["formulas"]),
+        "timings": timings,
+        "pages_per_sec": len(pages) / timings["process_pdf"]
+    }
+
+def bench_batch(base_dir: str, workers: int, shards: int) -> dict:
+    """Run the real batch path over the synthetic pdfs/levelN tree."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        results = process_all_levels(workers=workers, shards=shards, force=True,
+                                     ingest=False, use_page_cache=False,
+                                     base_dir=base_dir)
+        elapsed = time.perf_counter() - started
+    pages = sum(r["total_pages"] for r in results)
+    return {"files": len(results), "pages": pages, "seconds": elapsed,
+            "pages_per_sec": pages / elapsed if elapsed else 0.0}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--pages", type=int, default=400, help="Pages per synthetic PDF")
+    parser.add_argument("--files", type=int, default=3, help="Synthetic PDFs for the batch run")
+    parser.add_argument("--workers", type=int, default=1, help="Batch worker processes")
+    parser.add_argument("--shards", type=int, default=1, help="Page-range shards per PDF")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        level_dir = os.path.join(base_dir, "pdfs", "level1")
+        os.makedirs(os.path.join(level_dir, "out"))
+        print(f"Generating {args.files} synthetic PDFs x {args.pages} pages...")
+        for i in range(args.files):
+            make_synthetic_pdf(os.path.join(level_dir, f"CFA L1 (V{i + 1}).pdf"),
+                               args.pages, seed=i)
+
+        stages = bench_stages(level_dir, "CFA L1 (V1).pdf", args.shards)
+        batch = bench_batch(base_dir, args.workers, args.shards)
+
+    report = {"config": vars(args), "single_file": stages, "batch": batch,
+              "peak_rss_mb": peak_rss_mb()}
+
+    print("\n" + "=" * 60)
+    print("Extraction Benchmark")
+    print("=" * 60)
+    print(f"Single file: {stages['pages']} pages, {stages['sections']} sections, "
+          f"{stages['formulas']} formulas")
+    for stage, seconds in stages["timings"].items():
+        print(f"  {stage:<16} {seconds * 1000:9.1f} ms")
+    print(f"  {'pages/sec':<16} {stages['pages_per_sec']:9.0f}")
+    print(f"\nBatch ({batch['files']} files, {args.workers} workers, {args.shards} shards):")
+    print(f"  {'wall time':<16} {batch['seconds']:9.2f} s")
+    print(f"  {'pages/sec':<16} {batch['pages_per_sec']:9.0f}")
+    rss = report["peak_rss_mb"]
+    print(f"\nPeak RSS: {rss['self']:.0f} MB (main), {rss['children']:.0f} MB (largest worker)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+    return report
+
+if __name__ == "__main__":
+    main()
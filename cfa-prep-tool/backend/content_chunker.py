@@ -0,0 +1,127 @@
+"""Split long study content into prompt-sized chunks for parallel generation.
+
+Generation prompts used to see only ``content[:4000]``, so a long reading
+was summarised from its first few pages. Content is now packed into chunks
+of at most ``max_tokens`` (estimated at ~4 characters per token), breaking
+preferably at section headings, then at paragraphs, then at sentences. The
+requested flashcard/question count is spread over the chunks in proportion
+to their size, and the per-chunk results are merged back together.
+"""
+import re
+from typing import Dict, Iterable, List
+
+DEFAULT_CHUNK_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+
+# A paragraph opening with one of these starts a new section
+SECTION_PATTERN = re.compile(
+    r'^(?:#{1,6}\s|(?:READING|CHAPTER|SECTION) \d+\b'
+    r'|LEARNING OUTCOME STATEMENTS|SUMMARY|PRACTICE PROBLEMS|\d+(?:\.\d+)*\.?\s+[A-Z])',
+    re.IGNORECASE
+)
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (no tokenizer needed)."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _is_section_start(paragraph: str) -> bool:
+    first_line = paragraph.split('\n', 1)[0]
+    return len(first_line) <= 100 and SECTION_PATTERN.match(first_line) is not None
+
+def _split_oversized(paragraph: str, max_chars: int) -> List[str]:
+    """Break a paragraph longer than the budget at sentences, then at words."""
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+def chunk_content(content: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """Pack paragraphs into chunks of at most ``max_tokens`` estimated tokens.
+
+    A section heading closes the current chunk once it is half full, so
+    chunks tend to hold whole sections rather than the tail of one and the
+    head of the next.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    paragraphs = [p.strip() for p in re.split(r'\n\s*\n', content) if p.strip()]
+
+    chunks, current = [], ""
+    for paragraph in paragraphs:
+        if current and _is_section_start(paragraph) and len(current) >= max_chars // 2:
+            chunks.append(current)
+            current = ""
+        for piece in (_split_oversized(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph]):
+            if current and len(current) + 2 + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks or [content.strip()]
+
+def distribute_count(count: int, weights: List[int]) -> List[int]:
+    """Split ``count`` over chunks proportionally to ``weights`` (largest remainder).
+
+    When there are more chunks than items, the largest chunks get one each.
+    """
+    total = sum(weights)
+    if not weights or count <= 0:
+        return [0] * len(weights)
+    if total <= 0:
+        weights, total = [1] * len(weights), len(weights)
+    shares = [count * w / total for w in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda i: (counts[i] - shares[i], -weights[i]))
+    for i in by_remainder[:count - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+def dedupe_key(value) -> str:
+    """Case-, spacing- and punctuation-insensitive form used to spot repeats."""
+    return re.sub(r'\W+', ' ', str(value)).strip().lower()
+
+def merge_items(results: Iterable[List[Dict]], key: str) -> List[Dict]:
+    """Concatenate per-chunk lists, dropping items whose ``key`` repeats."""
+    merged, seen = [], set()
+    for items in results:
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            marker = dedupe_key(item.get(key, ""))
+            if marker and marker in seen:
+                continue
+            seen.add(marker)
+            merged.append(item)
+    return merged
+
+def merge_concepts(results: Iterable[Dict]) -> Dict:
+    """Union the lists of per-chunk concept extractions, keeping first-seen order."""
+    merged: Dict[str, List] = {}
+    seen: Dict[str, set] = {}
+    for concepts in results:
+        for field, values in (concepts or {}).items():
+            if not isinstance(values, list):
+                continue
+            bucket = merged.setdefault(field, [])
+            markers = seen.setdefault(field, set())
+            for value in values:
+                marker = dedupe_key(value.get("formula", value) if isinstance(value, dict) else value)
+                if marker not in markers:
+                    markers.add(marker)
+                    bucket.append(value)
+    return merged
@@ -1,6 +1,6 @@
 """Database configuration and session management."""
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -32,3 +32,15 @@ def get_db():
 def init_db():
     """Initialize database tables."""
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+
+def add_missing_columns(bind):
+    """Add columns introduced since a table was created (create_all skips existing tables)."""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN "
+                                      f"{column.name} {column.type.compile(bind.dialect)}"))
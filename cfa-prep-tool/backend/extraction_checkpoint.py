@@ -0,0 +1,62 @@
+"""Checkpoints that let an interrupted PDF extraction resume mid-volume.
+
+Every ``CHECKPOINT_PAGES`` pages the extractor saves the last completed page
+and the scanner state (finished sections, the open section, formulas and
+the buffered page) to ``{sha256}.json``. Writes go through a temporary file
+and ``os.replace``, so a crash leaves either the previous checkpoint or the
+new one, never a torn file. A checkpoint is removed once the volume's
+output has been written.
+"""
+import os
+import json
+from typing import Dict, Optional
+
+from pdf_extractor import TEXT_VERSION, RULES_VERSION
+
+CHECKPOINT_PAGES = 100
+
+class CheckpointStore:
+    """Per-PDF extraction checkpoints keyed by content hash."""
+
+    def __init__(self, checkpoint_dir: str, every: int = CHECKPOINT_PAGES):
+        self.checkpoint_dir = checkpoint_dir
+        self.every = every
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def path_for(self, pdf_hash: str) -> str:
+        return os.path.join(self.checkpoint_dir, f"{pdf_hash}.json")
+
+    def load(self, pdf_hash: str) -> Optional[Dict]:
+        """Return a checkpoint written by the current extractor, if any."""
+        try:
+            with open(self.path_for(pdf_hash), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable checkpoint for {pdf_hash[:12]}: {e}")
+            return None
+        if (checkpoint.get("text_version"), checkpoint.get("rules_version")) != (TEXT_VERSION, RULES_VERSION):
+            return None
+        return checkpoint
+
+    def save(self, pdf_hash: str, last_page: int, scanner_state: Dict, progress: Dict):
+        """Atomically replace the checkpoint for a PDF."""
+        path = self.path_for(pdf_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "text_version": TEXT_VERSION,
+                "rules_version": RULES_VERSION,
+                "last_page": last_page,
+                "scanner": scanner_state,
+                "progress": progress
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def discard(self, pdf_hash: str):
+        """Remove a PDF's checkpoint, if present."""
+        try:
+            os.remove(self.path_for(pdf_hash))
+        except FileNotFoundError:
+            pass
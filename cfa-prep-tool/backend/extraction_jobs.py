@@ -0,0 +1,229 @@
+"""Background extraction jobs for PDFs uploaded to the running server.
+
+Uploads are extracted in a process pool so the request workers (and the
+GIL of the server process) stay free. Workers report page progress over a
+multiprocessing queue; a listener thread folds it into the job table. When
+a job finishes, its result is recorded in the extraction manifest and
+loaded into ``cfa_content`` from the server process.
+"""
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import fitz  # PyMuPDF
+
+from batch_process_pdfs import _process_one
+from database import SessionLocal
+from services.content_service import ContentService
+from extraction_manifest import ExtractionManifest, MANIFEST_FILENAME, UNCHANGED, DUPLICATE, summarize_result
+from pdf_extractor import CFAPDFExtractor, file_sha256
+
+QUEUED = "queued"
+RUNNING = "running"
+INGESTING = "ingesting"
+DONE = "done"
+FAILED = "failed"
+
+# Workers report at most every this many pages
+PROGRESS_EVERY = 10
+
+_progress_queue = None
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+def _run_job(job_id: str, level_dir: str, output_dir: str, pdf_file: str,
+             cache_dir: str, pdf_hash: str):
+    """Extract one uploaded PDF inside a pool worker, reporting progress."""
+    last_reported = 0
+
+    def progress(page_number: int):
+        nonlocal last_reported
+        if page_number - last_reported >= PROGRESS_EVERY:
+            last_reported = page_number
+            _progress_queue.put((job_id, page_number))
+
+    _progress_queue.put((job_id, 0))
+    return _process_one(level_dir, output_dir, pdf_file, cache_dir=cache_dir,
+                        pdf_hash=pdf_hash, progress=progress)
+
+class ExtractionJobManager:
+    """Queue uploaded PDFs for extraction and track their progress.
+
+    Job state lives in memory; a server restart forgets finished jobs, but
+    uploaded files stay in ``pdfs/levelN`` and are picked up by the next
+    batch run through the manifest.
+    """
+
+    def __init__(self, base_dir: str, workers: int = 1, ingest: bool = True):
+        self.base_dir = base_dir
+        self.output_dir = os.path.join(base_dir, "data", "extracted")
+        self.cache_dir = os.path.join(base_dir, "data", "page_cache")
+        self.manifest_path = os.path.join(base_dir, "data", MANIFEST_FILENAME)
+        self.workers = workers
+        self.ingest = ingest
+        self.jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._queue = None
+        self._executor = None
+        self._listener = None
+
+    def _start(self):
+        if self._executor is not None:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._queue = multiprocessing.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=_init_worker,
+                                             initargs=(self._queue,))
+        self._listener = threading.Thread(target=self._listen, name="extraction-progress",
+                                          daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        """Apply (job_id, page) progress messages until shutdown sends None."""
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            job_id, page = message
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job["status"] not in (QUEUED, RUNNING):
+                    continue
+                if job["status"] == QUEUED:
+                    job["status"] = RUNNING
+                    job["started_at"] = time.time()
+                job["pages_processed"] = max(job["pages_processed"], page)
+
+    def submit(self, pdf_path: str) -> Dict:
+        """Queue extraction of a PDF saved under ``pdfs/levelN``; return the job."""
+        pdf_file = os.path.basename(pdf_path)
+        extractor = CFAPDFExtractor(os.path.dirname(pdf_path), self.output_dir)
+        level, volume = extractor.parse_level_and_volume(pdf_file)
+        with fitz.open(pdf_path) as doc:
+            total_pages = len(doc)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "filename": pdf_file,
+            "path": pdf_path,
+            "level": level,
+            "volume": volume,
+            "status": QUEUED,
+            "total_pages": total_pages,
+            "pages_processed": 0,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "summary": None,
+            "error": None
+        }
+        with self._lock:
+            self._start()
+            self.jobs[job["id"]] = job
+
+        future = self._executor.submit(_run_job, job["id"], os.path.dirname(pdf_path),
+                                       self.output_dir, pdf_file, self.cache_dir,
+                                       file_sha256(pdf_path))
+        future.add_done_callback(lambda f: self._finish(job["id"], pdf_path, f))
+        return self.status(job["id"])
+
+    def is_active(self, pdf_path: str) -> bool:
+        """Whether a queued or running job already covers this file."""
+        with self._lock:
+            return any(job["path"] == pdf_path and job["status"] in (QUEUED, RUNNING, INGESTING)
+                       for job in self.jobs.values())
+
+    def submit_changed(self, pdf_paths: List[str]) -> List[Dict]:
+        """Queue the PDFs the manifest does not list as extracted and current.
+
+        Used by the folder watcher; files with an active job are skipped.
+        """
+        manifest = ExtractionManifest(self.manifest_path, self.base_dir)
+        jobs = []
+        for pdf_path in pdf_paths:
+            if manifest.check(pdf_path) in (UNCHANGED, DUPLICATE) or self.is_active(pdf_path):
+                continue
+            try:
+                jobs.append(self.submit(pdf_path))
+                print(f"📥 Queued {os.path.basename(pdf_path)} for extraction")
+            except RuntimeError as e:
+                print(f"⚠️  Could not open {pdf_path}: {e}")
+        return jobs
+
+    def _finish(self, job_id: str, pdf_path: str, future):
+        """Record a finished extraction in the manifest and the database."""
+        try:
+            result, _ = future.result()
+            if not result:
+                raise RuntimeError("No content could be extracted")
+            with self._lock:
+                job = self.jobs[job_id]
+                job["status"] = INGESTING
+                job["pages_processed"] = job["total_pages"]
+                job["started_at"] = job["started_at"] or job["submitted_at"]
+
+            manifest = ExtractionManifest(self.manifest_path, self.base_dir)
+            output_path = os.path.join(self.output_dir, CFAPDFExtractor.output_filename(
+                result["level"], result["volume"]))
+            manifest.record(pdf_path, result, output_path, sha256=result.get("source_sha256"))
+            manifest.save()
+
+            if self.ingest:
+                db = SessionLocal()
+                try:
+                    ContentService(db).ingest_extracted([result])
+                finally:
+                    db.close()
+
+            with self._lock:
+                self.jobs[job_id].update(status=DONE, summary=summarize_result(result))
+        except Exception as e:
+            print(f"⚠️  Extraction job {job_id} failed: {e}")
+            with self._lock:
+                self.jobs[job_id].update(status=FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self.jobs[job_id]["finished_at"] = time.time()
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job with elapsed time and ETA, or None if unknown."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+
+        job["eta_seconds"] = None
+        job["elapsed_seconds"] = None
+        if job["started_at"]:
+            end = job["finished_at"] or time.time()
+            job["elapsed_seconds"] = round(end - job["started_at"], 2)
+            done = job["pages_processed"]
+            if job["status"] == RUNNING and done:
+                rate = done / max(end - job["started_at"], 1e-6)
+                job["eta_seconds"] = round((job["total_pages"] - done) / rate, 1)
+        job["percent"] = (round(100 * job["pages_processed"] / job["total_pages"], 1)
+                          if job["total_pages"] else 0.0)
+        return job
+
+    def list_jobs(self) -> List[Dict]:
+        """All known jobs, newest first."""
+        with self._lock:
+            job_ids = sorted(self.jobs, key=lambda j: self.jobs[j]["submitted_at"], reverse=True)
+        return [self.status(job_id) for job_id in job_ids]
+
+    def shutdown(self):
+        """Stop the worker pool and the progress listener."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue.put(None)
+        self._listener.join(timeout=5)
+        self._executor = None
@@ -0,0 +1,136 @@
+"""Content-hash manifest for incremental PDF extraction."""
+import os
+import json
+from typing import Dict, Optional
+
+from pdf_extractor import CFAPDFExtractor, TEXT_VERSION, RULES_VERSION, file_sha256
+
+MANIFEST_FILENAME = "extraction_manifest.json"
+
+# check() outcomes
+NEW = "new"
+CHANGED = "changed"
+RULES_CHANGED = "rules_changed"
+FORMAT_CHANGED = "format_changed"
+UNCHANGED = "unchanged"
+DUPLICATE = "duplicate"
+
+def summarize_result(result: Dict) -> Dict:
+    """Reduce an extraction result to the counts kept in the manifest."""
+    return {
+        "filename": result["filename"],
+        "level": result["level"],
+        "volume": result["volume"],
+        "total_pages": result["total_pages"],
+        "section_count": len(result["sections"]),
+        "formula_count": len(result["formulas"])
+    }
+
+class ExtractionManifest:
+    """Track which PDFs have already been extracted, and by which rules.
+
+    Each entry records the PDF's sha256, size, mtime and the extractor's
+    text/rules versions. A size+mtime match is trusted without hashing, so
+    a no-change re-run only costs one ``stat`` per file.
+    """
+
+    def __init__(self, path: str, root: str = None):
+        self.path = path
+        self.root = root or os.path.dirname(os.path.dirname(path))
+        self.entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable manifest {path}: {e}")
+
+    def _key(self, pdf_path: str) -> str:
+        pdf_path = os.path.abspath(pdf_path)
+        rel = os.path.relpath(pdf_path, self.root)
+        return pdf_path if rel.startswith('..') else rel
+
+    def get(self, pdf_path: str) -> Optional[Dict]:
+        """Return the stored entry for a PDF, if any."""
+        return self.entries.get(self._key(pdf_path))
+
+    def check(self, pdf_path: str, output_format: str = None) -> str:
+        """Classify a PDF as new, changed, rules_changed, format_changed, unchanged or duplicate.
+
+        ``format_changed`` is only reported when ``output_format`` is given and
+        the stored output was written in another format. ``duplicate`` means
+        the file still has the content of the file it was recorded as a copy of
+        (see ``record_duplicate``); the caller decides whether that file is
+        still around.
+        """
+        entry = self.get(pdf_path)
+        if not entry:
+            return NEW
+
+        if not entry.get("duplicate_of"):
+            output_path = os.path.join(self.root, entry.get("output", ""))
+            if not entry.get("output") or not os.path.exists(output_path):
+                return CHANGED
+
+        stat = os.stat(pdf_path)
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            if stat.st_size != entry["size"] or file_sha256(pdf_path) != entry["sha256"]:
+                return CHANGED
+            # Touched but identical: remember the new mtime to stay on the fast path
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self._dirty = True
+
+        if entry.get("duplicate_of"):
+            return DUPLICATE
+        if entry.get("text_version") != TEXT_VERSION:
+            return CHANGED
+        if entry.get("rules_version") != RULES_VERSION:
+            return RULES_CHANGED
+        if output_format:
+            summary = entry["summary"]
+            expected = CFAPDFExtractor.output_filename(summary["level"], summary["volume"], output_format)
+            if os.path.basename(entry["output"]) != expected:
+                return FORMAT_CHANGED
+        return UNCHANGED
+
+    def record(self, pdf_path: str, result: Dict, output_path: str, sha256: str = None):
+        """Store the entry for a freshly extracted PDF."""
+        stat = os.stat(pdf_path)
+        self.entries[self._key(pdf_path)] = {
+            "sha256": sha256 or file_sha256(pdf_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "text_version": TEXT_VERSION,
+            "rules_version": RULES_VERSION,
+            "output": os.path.relpath(os.path.abspath(output_path), self.root),
+            "summary": summarize_result(result)
+        }
+        self._dirty = True
+
+    def record_duplicate(self, pdf_path: str, sha256: str, original_path: str):
+        """Remember that a PDF is a byte-identical copy of ``original_path``.
+
+        Later runs then recognise it from its size and mtime without hashing.
+        """
+        stat = os.stat(pdf_path)
+        entry = {
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "duplicate_of": self._key(original_path)
+        }
+        if self.entries.get(self._key(pdf_path)) != entry:
+            self.entries[self._key(pdf_path)] = entry
+            self._dirty = True
+
+    def save(self):
+        """Atomically write the manifest if anything changed."""
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"files": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -0,0 +1,203 @@
+"""Compact, streamable storage for PDF extraction results.
+
+A volume is written as ``{level}_V{volume}_extracted.jsonl.gz`` with one JSON
+record per line: a ``meta`` record followed by every ``section`` and
+``formula``. Records are compressed in independent gzip members of
+``BLOCK_SIZE`` records, and a small ``.idx.json`` file maps each record to its
+block offset, so a reader can seek straight to one section and keep
+streaming from there without inflating the rest of the file. If the index
+is missing, or was written for a different version of the data file, the
+reader rebuilds it with one sequential pass over the gzip members.
+"""
+import os
+import json
+import gzip
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+JSONL_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx.json"
+BLOCK_SIZE = 32
+
+def index_path_for(data_path: str) -> str:
+    """Return the index file that accompanies a ``.jsonl.gz`` file."""
+    return data_path[:-len(JSONL_SUFFIX)] + INDEX_SUFFIX
+
+def _records(data: Dict) -> Iterator[Dict]:
+    """Flatten an extraction result into meta, section and formula records."""
+    meta = {k: v for k, v in data.items() if k not in ("sections", "formulas")}
+    meta["section_count"] = len(data.get("sections", []))
+    meta["formula_count"] = len(data.get("formulas", []))
+    yield {"type": "meta", **meta}
+    for section in data.get("sections", []):
+        yield {"type": "section", **section}
+    for formula in data.get("formulas", []):
+        yield {"type": "formula", **formula}
+
+def _index_entry(record: Dict, block: int, line: int) -> Dict:
+    entry = {"type": record["type"], "block": block, "line": line}
+    if record["type"] == "section":
+        entry["title"] = record.get("title")
+        entry["page"] = record.get("page")
+    return entry
+
+def write_extraction(data: Dict, data_path: str) -> str:
+    """Write ``data`` as compressed JSONL plus offset index; return the index path.
+
+    Both files are written to temporaries and moved into place, so readers
+    never see a half-written volume.
+    """
+    index_path = index_path_for(data_path)
+    entries = []
+    block: List[bytes] = []
+    offset = 0
+
+    tmp_data = f"{data_path}.tmp"
+    with open(tmp_data, 'wb') as f:
+        def flush_block():
+            nonlocal offset, block
+            if block:
+                member = gzip.compress(b''.join(block), compresslevel=6)
+                f.write(member)
+                offset += len(member)
+                block = []
+
+        for record in _records(data):
+            entries.append(_index_entry(record, offset, len(block)))
+            block.append(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            if len(block) >= BLOCK_SIZE:
+                flush_block()
+        flush_block()
+
+    tmp_index = f"{index_path}.tmp"
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump({"version": 1, "size": offset, "records": entries}, f, separators=(',', ':'))
+
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_index, index_path)
+    return index_path
+
+def rebuild_index(data_path: str) -> List[Dict]:
+    """Recover the offset index by walking the gzip members of a data file."""
+    with open(data_path, 'rb') as f:
+        raw = f.read()
+    entries = []
+    offset = 0
+    while offset < len(raw):
+        inflater = zlib.decompressobj(wbits=31)
+        payload = inflater.decompress(raw[offset:])
+        for line_number, line in enumerate(payload.splitlines()):
+            entries.append(_index_entry(json.loads(line), offset, line_number))
+        offset = len(raw) - len(inflater.unused_data)
+    return entries
+
+def _load_index(data_path: str) -> Optional[List[Dict]]:
+    """Index records if the index file exists and matches the data file's size."""
+    try:
+        with open(index_path_for(data_path), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Indexes written before the size field was added are trusted as-is
+    if index.get("size", os.path.getsize(data_path)) != os.path.getsize(data_path):
+        return None
+    return index.get("records")
+
+class ExtractionReader:
+    """Random-access reader over a ``.jsonl.gz`` extraction file."""
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        index = _load_index(data_path)
+        if index is None:
+            print(f"⚠️  Index for {os.path.basename(data_path)} is missing or stale; rebuilding it")
+            index = rebuild_index(data_path)
+        self.index: List[Dict] = index
+        self._section_positions = [i for i, e in enumerate(self.index) if e["type"] == "section"]
+        self._meta: Optional[Dict] = None
+
+    @property
+    def meta(self) -> Dict:
+        """Volume-level fields (level, volume, total_pages, sample pages...)."""
+        if self._meta is None:
+            self._meta = next(self.iter_records())
+        return self._meta
+
+    @property
+    def section_count(self) -> int:
+        return len(self._section_positions)
+
+    def section_titles(self) -> List[Dict]:
+        """List section titles and pages straight from the index."""
+        return [{"title": self.index[i]["title"], "page": self.index[i]["page"]}
+                for i in self._section_positions]
+
+    def iter_records(self, start: int = 0, record_type: str = None) -> Iterator[Dict]:
+        """Stream records from index position ``start`` to the end of the file."""
+        if start >= len(self.index):
+            return
+        entry = self.index[start]
+        with open(self.data_path, 'rb') as raw:
+            raw.seek(entry["block"])
+            with gzip.GzipFile(fileobj=raw) as stream:
+                for i, line in enumerate(stream):
+                    if i < entry["line"]:
+                        continue
+                    record = json.loads(line)
+                    if record_type is None or record["type"] == record_type:
+                        yield record
+
+    def iter_sections(self, start: int = 0) -> Iterator[Dict]:
+        """Stream sections beginning with the ``start``-th section."""
+        if start >= len(self._section_positions):
+            return iter(())
+        return self.iter_records(self._section_positions[start], "section")
+
+    def iter_formulas(self) -> Iterator[Dict]:
+        """Stream all formula records."""
+        first = next((i for i, e in enumerate(self.index) if e["type"] == "formula"), None)
+        if first is None:
+            return iter(())
+        return self.iter_records(first, "formula")
+
+    def get_section(self, position: int) -> Dict:
+        """Read a single section by its position in the volume."""
+        return next(self.iter_sections(position))
+
+    def find_sections(self, title: str) -> List[int]:
+        """Positions of sections whose title contains ``title`` (case-insensitive)."""
+        needle = title.lower()
+        return [n for n, i in enumerate(self._section_positions)
+                if needle in (self.index[i]["title"] or "").lower()]
+
+    def load(self) -> Dict:
+        """Rebuild the full extraction dict, as ``process_pdf`` returns it."""
+        data = None
+        sections, formulas = [], []
+        for record in self.iter_records():
+            kind = record.pop("type")
+            if kind == "meta":
+                record.pop("section_count", None)
+                record.pop("formula_count", None)
+                data = record
+            elif kind == "section":
+                sections.append(record)
+            else:
+                formulas.append(record)
+        data["sections"] = sections
+        data["formulas"] = formulas
+        return data
+
+def load_extraction(path: str) -> Dict:
+    """Load an extraction result written in either JSON or JSONL format."""
+    if path.endswith(JSONL_SUFFIX):
+        return ExtractionReader(path).load()
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def find_extraction(output_dir: str, level: str, volume: int) -> Optional[str]:
+    """Locate a volume's extraction file, taking the newest if both formats exist."""
+    candidates = [os.path.join(output_dir, f"{level}_V{volume}_extracted{suffix}")
+                  for suffix in (JSONL_SUFFIX, ".json")]
+    candidates = [path for path in candidates if os.path.exists(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
@@ -0,0 +1,165 @@
+"""In-memory formula store with an inverted index by symbol, level and volume.
+
+Formula lines from the extractor are normalized (unicode operators, spacing,
+trailing punctuation) and deduplicated; each unique formula keeps every place
+it occurs. Lookups intersect posting sets, so "all formulas using duration"
+is a couple of dict hits instead of a scan over the extracted JSON.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set
+
+_OPERATORS = str.maketrans({
+    '×': '*', '·': '*', '∙': '*', '÷': '/',
+    '–': '-', '—': '-', '−': '-',
+    '‘': "'", '’': "'", '“': '"', '”': '"'
+})
+_SPACE_RE = re.compile(r'\s+')
+_TIGHT_RE = re.compile(r'\s*([/^])\s*')
+_SPACED_RE = re.compile(r'\s*([=+*])\s*')
+# A minus right after an operator or bracket is a sign: "= -99.5"
+_SIGN_RE = re.compile(r'(^|[=+*/^(\[]\s*)-\s+(?=[\d.(])')
+# Identifiers: Latin names (PV, MacDur, w1, r_f) and single Greek letters
+_SYMBOL_RE = re.compile(r'[A-Za-z][A-Za-z0-9_]*|[Ͱ-Ͽ]')
+# Prose words that show up in extracted formula lines but are never symbols
+_STOPWORDS = {"the", "and", "for", "of", "per", "with", "from", "are", "is", "to",
+              "in", "on", "at", "by", "as", "or", "an", "note", "where"}
+
+# Concept names that expand to the symbols the curriculum uses for them.
+# Plain symbols are matched literally; only these names fan out.
+SYMBOL_ALIASES = {
+    "duration": ["duration", "d", "dur", "macdur", "moddur", "effdur", "keyratedur",
+                 "macaulay", "modified"],
+    "convexity": ["convexity", "c", "convex", "effcon", "approxcon"],
+    "present value": ["pv", "v0", "p0"],
+    "future value": ["fv", "vn", "pn"],
+    "yield": ["ytm", "y", "r", "ytc", "ytw", "yield"],
+    "rate": ["r", "i", "rf", "rate"],
+    "periods": ["n", "t", "periods"],
+    "return": ["r", "rp", "rm", "ri", "return"],
+    "beta": ["beta", "β"],
+    "volatility": ["sigma", "σ", "sd", "volatility"],
+    "sharpe": ["sharpe"],
+    "dividend": ["div", "dps", "d0", "d1", "dividend"],
+    "earnings": ["eps", "e", "e0", "e1", "earnings"],
+    "wacc": ["wacc", "kd", "ke", "re", "rd"],
+    "exchange rate": ["s", "f", "fx", "rfx", "exchange", "rate"],
+}
+
+def normalize_formula(text: str) -> str:
+    """Canonical display form: ASCII operators and consistent spacing.
+
+    ``=``, ``+`` and ``*`` are spaced, ``/`` and ``^`` are not, and brackets
+    hug their contents. Hyphens are left alone since most are in words.
+    """
+    text = _SPACE_RE.sub(' ', text.translate(_OPERATORS)).strip()
+    text = _TIGHT_RE.sub(r'\1', text)
+    text = _SPACED_RE.sub(r' \1 ', text)
+    text = _SIGN_RE.sub(r'\1-', text)
+    text = text.replace('( ', '(').replace(' )', ')').replace('[ ', '[').replace(' ]', ']')
+    return text.strip().rstrip('.,;:')
+
+def formula_symbols(text: str) -> Set[str]:
+    """Lower-cased variable symbols and words appearing in a formula."""
+    return {symbol.lower() for symbol in _SYMBOL_RE.findall(text)} - _STOPWORDS
+
+def expand_query(term: str) -> List[str]:
+    """Symbols to look up for a query term (concept name or literal symbol)."""
+    term = _SPACE_RE.sub(' ', term.strip().lower())
+    return SYMBOL_ALIASES.get(term, [term])
+
+class FormulaIndex:
+    """Deduplicated formulas with posting sets per symbol, level and volume."""
+
+    def __init__(self):
+        self.formulas: List[Dict] = []
+        self._ids: Dict[str, int] = {}
+        self.by_symbol: Dict[str, Set[int]] = {}
+        self.by_level: Dict[str, Set[int]] = {}
+        self.by_volume: Dict[tuple, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.formulas)
+
+    def add(self, formula: str, level: str = None, volume: int = None,
+            page: int = None, topic: str = None) -> int:
+        """Add one occurrence of a formula; return the formula's id."""
+        normalized = normalize_formula(formula)
+        key = normalized.replace(' ', '')
+        formula_id = self._ids.get(key)
+        if formula_id is None:
+            formula_id = len(self.formulas)
+            self._ids[key] = formula_id
+            symbols = formula_symbols(normalized)
+            self.formulas.append({
+                "id": formula_id,
+                "formula": normalized,
+                "symbols": sorted(symbols),
+                "occurrences": []
+            })
+            for symbol in symbols:
+                self.by_symbol.setdefault(symbol, set()).add(formula_id)
+
+        occurrence = {"level": level, "volume": volume, "page": page, "topic": topic}
+        entry = self.formulas[formula_id]
+        if occurrence not in entry["occurrences"]:
+            entry["occurrences"].append(occurrence)
+        if level:
+            self.by_level.setdefault(level, set()).add(formula_id)
+            if volume is not None:
+                self.by_volume.setdefault((level, volume), set()).add(formula_id)
+        return formula_id
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> "FormulaIndex":
+        """Build from cfa_content formula rows or plain tuples of
+        (content, level, volume, page_number, topic)."""
+        index = cls()
+        for row in rows:
+            if hasattr(row, "page_number"):
+                row = (row.content, row.level, row.volume, row.page_number, row.topic)
+            index.add(*row)
+        return index
+
+    def search(self, symbol: Optional[str] = None, level: Optional[str] = None,
+               volume: Optional[int] = None, page: Optional[int] = None,
+               limit: int = 50) -> List[Dict]:
+        """Formulas matching every given filter, in first-seen order.
+
+        ``symbol`` may be a literal symbol (``PV``) or a concept name from
+        ``SYMBOL_ALIASES`` (``duration``). With ``page`` only occurrences on
+        that page (of the given level/volume, if any) are kept.
+        """
+        candidates: Optional[Set[int]] = None
+        if symbol:
+            candidates = set()
+            for term in expand_query(symbol):
+                candidates |= self.by_symbol.get(term, set())
+        if level:
+            postings = (self.by_volume.get((level, volume), set()) if volume is not None
+                        else self.by_level.get(level, set()))
+            candidates = postings if candidates is None else candidates & postings
+        elif volume is not None:
+            postings = set().union(*(ids for (_, vol), ids in self.by_volume.items()
+                                     if vol == volume))
+            candidates = postings if candidates is None else candidates & postings
+
+        ids = sorted(candidates) if candidates is not None else range(len(self.formulas))
+        matches = []
+        for formula_id in ids:
+            entry = self.formulas[formula_id]
+            if page is not None:
+                occurrences = [o for o in entry["occurrences"] if o["page"] == page
+                               and (not level or o["level"] == level)
+                               and (volume is None or o["volume"] == volume)]
+                if not occurrences:
+                    continue
+                entry = {**entry, "occurrences": occurrences}
+            matches.append(entry)
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def top_symbols(self, limit: int = 50) -> List[Dict]:
+        """Most widely used symbols, for browsing."""
+        ranked = sorted(self.by_symbol.items(), key=lambda item: (-len(item[1]), item[0]))
+        return [{"symbol": symbol, "formulas": len(ids)} for symbol, ids in ranked[:limit]]
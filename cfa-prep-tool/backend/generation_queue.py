@@ -0,0 +1,425 @@
+"""Persistent, prioritized queue for flashcard/quiz/bundle generation.
+
+Generation used to run inline in the HTTP request, so a burst of requests
+piled parallel inference onto the single local Ollama instance. Jobs are now
+rows in ``generation_jobs`` and a fixed pool of worker threads (sized to what
+the model server can run at once) works through them:
+
+- interactive jobs (priority 0) run before bulk jobs (priority 10); within a
+  priority, oldest first.
+- a job whose generation fails or yields nothing is retried with exponential
+  backoff, up to ``max_attempts``; then it is marked failed.
+- a claimed job holds a lease (``claimed_by``/``lease_until``) that its
+  process renews while the job runs; a running job whose lease has expired
+  (its process crashed or was stopped) is queued again. Jobs running in
+  another live process keep their lease and are left alone.
+
+A job's deadline starts when a worker picks it up, not while it waits.
+"""
+import os
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from models import GenerationJob
+from content_analyzer_hybrid import Deadline, default_deadline_seconds
+from services.flashcard_service import FlashcardService
+from services.quiz_service import QuizService
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+KINDS = ("flashcards", "quiz", "bundle")
+PRIORITIES = {"interactive": 0, "bulk": 10}
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5.0
+POLL_INTERVAL = 1.0
+LEASE_SECONDS = 60.0
+
+def store_bundle(db: Session, bundle: Dict, commit: bool = True) -> Dict:
+    """Store the complete flashcards and questions of a generated bundle; return counts.
+
+    Both are written in one transaction (left open with ``commit=False``),
+    so a failure never leaves the flashcards stored without the questions.
+    """
+    cards = [c for c in bundle["flashcards"] if all(c.get(f) for f in FlashcardService.REQUIRED_FIELDS)]
+    items = [q for q in bundle["questions"] if all(q.get(f) for f in QuizService.REQUIRED_FIELDS)]
+    try:
+        flashcards = FlashcardService(db).store_generated_flashcards(cards, commit=False)
+        questions = QuizService(db).store_generated_questions(items, commit=False)
+        if commit:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {
+        "flashcard_count": len(flashcards),
+        "question_count": len(questions),
+        "concepts": bundle["concepts"]
+    }
+
+def usable_result(kind: str, result: Dict) -> bool:
+    """Whether a job produced anything worth keeping (otherwise it is retried).
+
+    Flashcard and quiz jobs need at least one stored item. A bundle also
+    counts when it has only concepts: they are part of its result, and
+    content without card or question material would not yield any on retry.
+    """
+    if result.get("flashcard_count") or result.get("question_count"):
+        return True
+    if kind == "bundle":
+        concepts = result.get("concepts") or {}
+        return any(isinstance(values, list) and values for values in concepts.values())
+    return False
+
+def priority_name(priority: int) -> str:
+    for name, value in PRIORITIES.items():
+        if value == priority:
+            return name
+    return str(priority)
+
+class GenerationQueue:
+    """SQLite-backed job queue drained by a pool of worker threads."""
+
+    def __init__(self, session_factory: Callable[[], Session], analyzer, workers: int = 1,
+                 max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY,
+                 poll_interval: float = POLL_INTERVAL, lease_seconds: float = LEASE_SECONDS):
+        self.session_factory = session_factory
+        self.analyzer = analyzer
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[int, str] = {}  # job id -> claim token
+        self._running_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._claim_lock = threading.Lock()
+
+    def start(self):
+        """Requeue jobs whose lease has expired and start the workers and heartbeat."""
+        if self._threads:
+            return
+        recovered = self.recover()
+        if recovered:
+            print(f"🔁 Requeued {recovered} interrupted generation job(s)")
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"generation-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="generation-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def recover(self) -> int:
+        """Put running jobs whose lease has expired back in the queue (their worker is gone)."""
+        db = self.session_factory()
+        try:
+            count = db.query(GenerationJob).filter(
+                GenerationJob.status == RUNNING,
+                or_(GenerationJob.lease_until.is_(None), GenerationJob.lease_until < datetime.utcnow())
+            ).update({"status": QUEUED, "started_at": None, "claimed_by": None, "lease_until": None},
+                     synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    def _renew_leases(self):
+        """Extend the leases of the jobs this process is running."""
+        with self._running_lock:
+            tokens = list(self._running.values())
+        if not tokens:
+            return
+        db = self.session_factory()
+        try:
+            db.query(GenerationJob).filter(
+                GenerationJob.status == RUNNING,
+                GenerationJob.claimed_by.in_(tokens)
+            ).update({"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)},
+                     synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _heartbeat(self):
+        """Renew our leases a few times per lease period, and requeue expired ones."""
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                self._renew_leases()
+                recovered = self.recover()
+            except Exception as e:
+                print(f"⚠️  Generation lease heartbeat error: {e}")
+                continue
+            if recovered:
+                print(f"🔁 Requeued {recovered} generation job(s) whose worker stopped")
+                with self._wakeup:
+                    self._wakeup.notify_all()
+
+    def submit(self, kind: str, content: str, topic: str, level: str, priority: str = "bulk",
+               flashcard_count: int = 10, question_count: int = 5,
+               deadline_seconds: Optional[float] = None) -> Dict:
+        """Queue a generation job and return its status."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(KINDS)}")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}")
+
+        db = self.session_factory()
+        try:
+            job = GenerationJob(
+                kind=kind,
+                status=QUEUED,
+                priority=PRIORITIES[priority],
+                topic=topic,
+                level=level,
+                payload={
+                    "content": content,
+                    "flashcard_count": flashcard_count,
+                    "question_count": question_count,
+                    "deadline_seconds": deadline_seconds
+                },
+                attempts=0,
+                max_attempts=self.max_attempts,
+                created_at=datetime.utcnow()
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        finally:
+            db.close()
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.status(job_id)
+
+    def _claim(self) -> Optional[Tuple[int, str]]:
+        """Mark the most urgent runnable job as running; return its id and claim token.
+
+        The token (``claimed_by``) is unique to this claim, so a run whose
+        job was requeued and claimed again can tell it no longer owns it.
+        """
+        now = datetime.utcnow()
+        token = f"{self._owner}:{uuid.uuid4().hex[:12]}"
+        with self._claim_lock:
+            db = self.session_factory()
+            try:
+                job = db.query(GenerationJob.id).filter(
+                    GenerationJob.status == QUEUED,
+                    or_(GenerationJob.run_after.is_(None), GenerationJob.run_after <= now)
+                ).order_by(GenerationJob.priority, GenerationJob.created_at, GenerationJob.id).first()
+                if job is None:
+                    return None
+                # Conditional update, so a second server process cannot take it too
+                claimed = db.query(GenerationJob).filter(
+                    GenerationJob.id == job.id, GenerationJob.status == QUEUED
+                ).update({"status": RUNNING, "started_at": now,
+                          "attempts": GenerationJob.attempts + 1, "claimed_by": token,
+                          "lease_until": now + timedelta(seconds=self.lease_seconds)},
+                         synchronize_session=False)
+                db.commit()
+                return (job.id, token) if claimed else None
+            finally:
+                db.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            claim = self._claim()
+            if claim is None:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+            job_id, token = claim
+            with self._running_lock:
+                self._running[job_id] = token
+            try:
+                self._run(job_id, token)
+            except Exception as e:
+                print(f"⚠️  Generation worker error on job {job_id}: {e}")
+                self._abandon(job_id, token, e)
+            finally:
+                with self._running_lock:
+                    self._running.pop(job_id, None)
+
+    def _abandon(self, job_id: int, token: str, error: Exception):
+        """Retry or fail a job whose run raised outside the generation itself."""
+        db = self.session_factory()
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            if job is not None:
+                self._fail(db, job, token, error)
+        except Exception as e:
+            db.rollback()
+            # Its lease is no longer renewed, so recover() requeues it
+            print(f"⚠️  Could not record the failure of generation job {job_id}: {e}")
+        finally:
+            db.close()
+
+    def _owned(self, db: Session, job_id: int, token: str):
+        """Query for the job, if it is still running under this claim."""
+        return db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.status == RUNNING,
+            GenerationJob.claimed_by == token
+        )
+
+    def _run(self, job_id: int, token: str):
+        """Generate and store one claimed job, then record the outcome.
+
+        The generated items and the job's completion are committed together,
+        and only while this claim still owns the job; a run whose lease
+        lapsed (and whose job may be running elsewhere) stores nothing.
+        """
+        db = self.session_factory()
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            kind, topic = job.kind, job.topic
+            payload = job.payload
+            deadline = Deadline(payload.get("deadline_seconds") or default_deadline_seconds())
+            try:
+                result = self._generate(db, kind, topic, job.level, payload, deadline)
+                if not usable_result(kind, result):
+                    raise RuntimeError("Model returned no usable items")
+            except Exception as e:
+                db.rollback()
+                self._fail(db, job, token, e)
+                return
+            result["partial"] = deadline.cut_short
+            finished = self._owned(db, job_id, token).update(
+                {"status": DONE, "result": result, "error": None, "lease_until": None,
+                 "finished_at": datetime.utcnow()}, synchronize_session=False)
+            if not finished:
+                db.rollback()
+                print(f"⚠️  Generation job {job_id} was claimed again after its lease expired; "
+                      f"dropping this run's result")
+                return
+            db.commit()
+            print(f"✓ Generation job {job_id} ({kind}, {topic}) done")
+        finally:
+            db.close()
+
+    def _generate(self, db: Session, kind: str, topic: str, level: str, payload: Dict,
+                  deadline: Deadline) -> Dict:
+        """Generate a job's items and add them to the session, uncommitted."""
+        content = payload["content"]
+        if kind == "flashcards":
+            cards = self.analyzer.generate_flashcards(content, topic, level, payload["flashcard_count"], deadline)
+            flashcards = FlashcardService(db).store_generated_flashcards(cards, commit=False)
+            return {"flashcard_count": len(flashcards)}
+        if kind == "quiz":
+            items = self.analyzer.generate_quiz_questions(content, topic, level, payload["question_count"], deadline)
+            questions = QuizService(db).store_generated_questions(items, commit=False)
+            return {"question_count": len(questions)}
+        bundle = self.analyzer.generate_bundle(content, topic, level, payload["flashcard_count"],
+                                               payload["question_count"], deadline)
+        return store_bundle(db, bundle, commit=False)
+
+    def _fail(self, db: Session, job: GenerationJob, token: str, error: Exception):
+        """Schedule a retry with exponential backoff, or give up after max_attempts.
+
+        Like completion, this only applies while ``token`` still owns the job.
+        """
+        job_id, attempts, max_attempts = job.id, job.attempts, job.max_attempts
+        message = str(error) or type(error).__name__
+        changes = {"error": message, "lease_until": None}
+        if attempts < max_attempts:
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            changes.update(status=QUEUED, claimed_by=None,
+                           run_after=datetime.utcnow() + timedelta(seconds=delay))
+            outcome = f"failed (attempt {attempts}/{max_attempts}): {message}; retrying in {delay:.0f}s"
+        else:
+            changes.update(status=FAILED, finished_at=datetime.utcnow())
+            outcome = f"failed after {attempts} attempts: {message}"
+        if not self._owned(db, job_id, token).update(changes, synchronize_session=False):
+            db.rollback()
+            print(f"⚠️  Generation job {job_id} was claimed again after its lease expired; "
+                  f"not recording this run's failure")
+            return
+        db.commit()
+        print(f"⚠️  Generation job {job_id} {outcome}")
+
+    def _as_dict(self, db: Session, job: GenerationJob) -> Dict:
+        position = None
+        if job.status == QUEUED:
+            # Queued jobs that will be claimed before this one
+            position = db.query(func.count(GenerationJob.id)).filter(
+                GenerationJob.status == QUEUED,
+                or_(GenerationJob.priority < job.priority,
+                    (GenerationJob.priority == job.priority) & (GenerationJob.created_at < job.created_at),
+                    (GenerationJob.priority == job.priority) & (GenerationJob.created_at == job.created_at)
+                    & (GenerationJob.id < job.id))
+            ).scalar()
+        elapsed = None
+        if job.started_at:
+            elapsed = round(((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds(), 2)
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "priority": priority_name(job.priority),
+            "topic": job.topic,
+            "level": job.level,
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "queue_position": position,
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+            "elapsed_seconds": elapsed
+        }
+
+    def status(self, job_id: int) -> Optional[Dict]:
+        """Snapshot of a job, or None if unknown."""
+        db = self.session_factory()
+        try:
+            job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+            return self._as_dict(db, job) if job is not None else None
+        finally:
+            db.close()
+
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Most recent jobs, newest first, optionally filtered by status."""
+        db = self.session_factory()
+        try:
+            query = db.query(GenerationJob)
+            if status:
+                query = query.filter(GenerationJob.status == status)
+            jobs = query.order_by(GenerationJob.created_at.desc(), GenerationJob.id.desc()).limit(limit).all()
+            return [self._as_dict(db, job) for job in jobs]
+        finally:
+            db.close()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        db = self.session_factory()
+        try:
+            rows = db.query(GenerationJob.status, func.count(GenerationJob.id)).group_by(
+                GenerationJob.status).all()
+        finally:
+            db.close()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop the workers; a job still running is requeued once its lease expires."""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
@@ -0,0 +1,84 @@
+"""Incremental parser for a JSON array arriving token by token.
+
+Models answer generation prompts with a JSON array, often wrapped in a
+markdown fence and sometimes followed by stray text. ``JsonArrayParser``
+scans the stream once, tracking string and nesting state, and hands back
+each top-level element as soon as its closing brace arrives. Anything
+before the opening ``[`` or after the closing ``]`` is ignored, and an
+element that fails to parse is skipped without losing its neighbours.
+"""
+import json
+from typing import Any, List
+
+class JsonArrayParser:
+    """Feed text chunks; get back the array elements completed by each chunk."""
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self.parsed = 0
+        self.skipped = 0
+        self._element: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _flush(self, items: List[Any]):
+        text = "".join(self._element).strip()
+        self._element = []
+        if not text:
+            return
+        try:
+            items.append(json.loads(text))
+            self.parsed += 1
+        except ValueError:
+            self.skipped += 1
+
+    def feed(self, text: str) -> List[Any]:
+        items: List[Any] = []
+        element = self._element
+        for ch in text:
+            if self.done:
+                break
+            if not self.started:
+                self.started = ch == '['
+                continue
+            if self._in_string:
+                element.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+                element.append(ch)
+            elif ch in '{[':
+                self._depth += 1
+                element.append(ch)
+            elif ch in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    self._flush(items)
+                    element = self._element
+                    self.done = True
+                    continue
+                self._depth -= 1
+                element.append(ch)
+                if self._depth == 0:
+                    self._flush(items)
+                    element = self._element
+            elif ch == ',' and self._depth == 0:
+                self._flush(items)
+                element = self._element
+            else:
+                element.append(ch)
+        return items
+
+    def close(self) -> List[Any]:
+        """End of stream: salvage a final complete element if the array was cut off."""
+        items: List[Any] = []
+        if self.started and not self.done and self._depth == 0 and not self._in_string:
+            self._flush(items)
+        return items
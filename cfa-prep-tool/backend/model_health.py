@@ -0,0 +1,172 @@
+"""Per-model health tracking for ordering fallbacks and skipping dead models.
+
+Every model call reports its outcome and latency. Each model keeps an
+exponentially weighted moving average (EWMA) of latency and error rate, and
+a circuit breaker:
+
+- closed: calls flow normally; ``failure_threshold`` consecutive failures
+  open the breaker.
+- open: the model is skipped outright for ``cooldown`` seconds (doubling on
+  each failed trial, up to ``max_cooldown``).
+- half-open: after the cooldown a single trial call is let through; success
+  closes the breaker, failure re-opens it.
+
+Fallbacks are then tried healthiest first instead of in a fixed order.
+"""
+import time
+import threading
+from typing import Dict, Iterable, List, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+EWMA_ALPHA = 0.3
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+MAX_COOLDOWN = 300.0
+
+class ModelState:
+    """Health statistics and breaker state of one model."""
+
+    def __init__(self, cooldown: float):
+        self.state = CLOSED
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.opened_at: Optional[float] = None
+        self.cooldown = cooldown
+        self.trial_in_flight = False
+        self.last_error: Optional[str] = None
+
+    def as_dict(self, now: float) -> Dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.opened_at + self.cooldown - now), 1)
+        return {
+            "state": self.state,
+            "latency_ewma_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "error_rate_ewma": round(self.error_rate, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "retry_in_seconds": retry_in,
+            "last_error": self.last_error
+        }
+
+class ModelHealth:
+    """Thread-safe health registry shared by all calls of an analyzer."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN,
+                 max_cooldown: float = MAX_COOLDOWN, alpha: float = EWMA_ALPHA):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.alpha = alpha
+        self._models: Dict[str, ModelState] = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model: str) -> ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = ModelState(self.base_cooldown)
+        return state
+
+    def _ewma(self, previous: Optional[float], sample: float) -> float:
+        return sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+
+    def allow(self, model: str, now: Optional[float] = None) -> bool:
+        """Whether a call to ``model`` may go ahead (claims the half-open trial)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._state(model)
+            if state.state == OPEN and now - state.opened_at >= state.cooldown:
+                state.state = HALF_OPEN
+                state.trial_in_flight = False
+            if state.state == CLOSED:
+                return True
+            if state.state == HALF_OPEN and not state.trial_in_flight:
+                state.trial_in_flight = True
+                return True
+            return False
+
+    def release(self, model: str):
+        """Give back a half-open trial whose call was cancelled rather than failed."""
+        with self._lock:
+            self._state(model).trial_in_flight = False
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            state = self._state(model)
+            state.latency = self._ewma(state.latency, latency)
+            state.error_rate = self._ewma(state.error_rate, 0.0)
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.state = CLOSED
+            state.cooldown = self.base_cooldown
+            state.trial_in_flight = False
+
+    def record_failure(self, model: str, latency: float, error: str = None, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._state(model)
+            state.error_rate = self._ewma(state.error_rate, 1.0)
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = error
+            if state.state == HALF_OPEN:
+                # The trial failed: back off for longer
+                state.cooldown = min(state.cooldown * 2, self.max_cooldown)
+                self._open(model, state, now)
+            elif state.state == CLOSED and state.consecutive_failures >= self.failure_threshold:
+                self._open(model, state, now)
+
+    def _open(self, model: str, state: ModelState, now: float):
+        state.state = OPEN
+        state.opened_at = now
+        state.trial_in_flight = False
+        print(f"⚡ Circuit open for {model} ({state.consecutive_failures} failures); "
+              f"skipping it for {state.cooldown:.0f}s")
+
+    def _available(self, model: str, now: float) -> bool:
+        state = self._models.get(model)
+        if state is None or state.state == CLOSED:
+            return True
+        if state.state == OPEN:
+            return now - state.opened_at >= state.cooldown
+        return not state.trial_in_flight
+
+    def _score(self, model: str):
+        state = self._models.get(model)
+        if state is None or state.latency is None:
+            # Untried: after models known to work, ahead of ones that fail
+            return (0.0, float("inf")) if state is None else (round(state.error_rate, 2), float("inf"))
+        return (round(state.error_rate, 2), state.latency)
+
+    def order(self, model: str, fallbacks: List[str], now: Optional[float] = None) -> List[str]:
+        """Models to try for a request: the requested one, then fallbacks healthiest first.
+
+        Models whose breaker is open are left out. Untried models rank after
+        working ones, and ties keep the configured fallback order. Callers still
+        call ``allow`` right before each attempt, and report the left-out
+        models with ``record_skipped`` once per request.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            candidates = sorted((m for m in fallbacks if m != model), key=self._score)
+            return [m for m in [model] + candidates if self._available(m, now)]
+
+    def record_skipped(self, models: Iterable[str]):
+        """Count a request that left these models out."""
+        with self._lock:
+            for model in models:
+                self._state(model).skipped += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return {model: state.as_dict(now) for model, state in sorted(self._models.items())}
@@ -0,0 +1,96 @@
+"""Process-wide view of which Ollama models are installed.
+
+Probing ``/api/tags`` used to happen inside every analyzer constructor, so a
+slow Ollama added seconds to each generation request. The registry probes
+once in a background thread at startup and then every ``ttl`` seconds;
+request handlers only read the last known model list.
+"""
+import time
+import threading
+from typing import Dict, Optional, Set
+
+import httpx
+
+DEFAULT_TTL = 60.0
+PROBE_TIMEOUT = 5.0
+
+class ModelRegistry:
+    """Cached, periodically refreshed set of installed Ollama model names."""
+
+    def __init__(self, ollama_base_url: str, ttl: float = DEFAULT_TTL,
+                 probe_timeout: float = PROBE_TIMEOUT, client: httpx.Client = None):
+        self.tags_url = f"{ollama_base_url.replace('/v1', '')}/api/tags"
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self._client = client
+        self._models: Set[str] = set()
+        self._lock = threading.Lock()
+        self._probed = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_probe: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.reachable = False
+
+    def probe(self) -> bool:
+        """Fetch the installed models now; return whether Ollama answered."""
+        try:
+            if self._client is not None:
+                response = self._client.get(self.tags_url, timeout=self.probe_timeout)
+            else:
+                response = httpx.get(self.tags_url, timeout=self.probe_timeout)
+            response.raise_for_status()
+            models = {model.get('name', '') for model in response.json().get('models', [])}
+            error = None
+        except Exception as e:
+            models, error = set(), str(e)
+
+        with self._lock:
+            changed = models != self._models or (error is None) != self.reachable
+            self._models = models
+            self.reachable = error is None
+            self.last_error = error
+            self.last_probe = time.time()
+        self._probed.set()
+
+        if changed:
+            if error:
+                print(f"⚠ Ollama not reachable at {self.tags_url}: {error}")
+            else:
+                print(f"✓ Ollama models available: {', '.join(sorted(models)) or 'none'}")
+        return error is None
+
+    def has_model(self, prefix: str) -> bool:
+        """Whether an installed model name starts with ``prefix`` (never blocks)."""
+        with self._lock:
+            return any(name.startswith(prefix) for name in self._models)
+
+    def wait_until_probed(self, timeout: float = None) -> bool:
+        """Block until the first probe has finished (for scripts and tests)."""
+        return self._probed.wait(timeout)
+
+    def _run(self):
+        while True:
+            self.probe()
+            if self._stop.wait(self.ttl):
+                return
+
+    def start(self):
+        """Probe now and then every ``ttl`` seconds, in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "reachable": self.reachable,
+                "models": sorted(self._models),
+                "last_probe": self.last_probe,
+                "last_error": self.last_error,
+                "ttl_seconds": self.ttl
+            }
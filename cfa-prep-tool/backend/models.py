@@ -16,6 +16,7 @@ class CFAContent(Base):
     content = Column(Text)
     content_type = Column(String)  # chapter, section, formula, definition
     page_number = Column(Integer)
+    minhash = Column(String)  # section sketch (hex); "" if too short to sketch
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -128,3 +129,25 @@ class LearningProgress(Base):
     total_time_spent = Column(Integer, default=0)  # minutes
     last_studied = Column(DateTime)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GenerationJob(Base):
+    """Queued flashcard/quiz/bundle generation, persisted across restarts."""
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String)  # flashcards, quiz, bundle
+    status = Column(String, index=True)  # queued, running, done, failed
+    priority = Column(Integer, default=10)  # lower runs first: 0 interactive, 10 bulk
+    topic = Column(String)
+    level = Column(String)
+    payload = Column(JSON)  # content, counts and deadline of the request
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime)  # retry backoff: not claimed before this
+    claimed_by = Column(String)  # host:pid:token of the process running it
+    lease_until = Column(DateTime)  # requeued if still running after this
+    result = Column(JSON)  # counts (and concepts for bundles)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
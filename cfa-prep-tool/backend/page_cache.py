@@ -0,0 +1,126 @@
+"""Compressed, memory-mapped cache of raw per-page PDF text.
+
+Re-running the section/formula heuristics should not pay for fitz text
+extraction again. Each PDF gets one ``{sha256}.pages`` file holding its pages
+as independent zlib blobs, followed by a JSON footer (page index, outline and
+text version) and an 8-byte footer length. Readers mmap the file and inflate
+one page at a time.
+"""
+import os
+import json
+import mmap
+import zlib
+import struct
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from pdf_extractor import TEXT_VERSION
+
+MAGIC = b"CFAPAGES1\n"
+FOOTER_LEN = struct.Struct("<Q")
+
+class _CacheWriter:
+    """Appends compressed pages to a temporary cache file."""
+
+    def __init__(self, f):
+        self._f = f
+        self._offset = len(MAGIC)
+        self.index: List[List[int]] = []
+
+    def add(self, page: Dict):
+        blob = zlib.compress(page["text"].encode('utf-8'), 6)
+        self._f.write(blob)
+        self.index.append([page["page_number"], self._offset, len(blob), page["char_count"]])
+        self._offset += len(blob)
+
+class PageTextCache:
+    """Per-page text store keyed by PDF hash and page number."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, pdf_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{pdf_hash}.pages")
+
+    def _read_footer(self, mm) -> Dict:
+        (footer_len,) = FOOTER_LEN.unpack(mm[-FOOTER_LEN.size:])
+        start = len(mm) - FOOTER_LEN.size - footer_len
+        return json.loads(mm[start:start + footer_len])
+
+    def _load(self, pdf_hash: str) -> Optional[Dict]:
+        path = self.path_for(pdf_hash)
+        try:
+            with open(path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if mm[:len(MAGIC)] != MAGIC:
+                        return None
+                    footer = self._read_footer(mm)
+        except (OSError, ValueError):
+            return None
+        if footer.get("text_version") != TEXT_VERSION:
+            return None
+        return footer
+
+    def has(self, pdf_hash: str) -> bool:
+        """Check for a complete cache entry built with the current text version."""
+        return self._load(pdf_hash) is not None
+
+    def read_toc(self, pdf_hash: str) -> List[List]:
+        """Return the outline stored alongside the pages."""
+        footer = self._load(pdf_hash)
+        return footer["toc"] if footer else []
+
+    def iter_pages(self, pdf_hash: str, start_page: int = 1) -> Iterator[Dict]:
+        """Yield cached page dicts (same shape as the extractor's) in page order."""
+        footer = self._load(pdf_hash)
+        if footer is None:
+            raise KeyError(f"No cached pages for {pdf_hash}")
+        with open(self.path_for(pdf_hash), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for page_number, offset, length, char_count in footer["pages"]:
+                    if page_number < start_page:
+                        continue
+                    yield {
+                        "page_number": page_number,
+                        "text": zlib.decompress(mm[offset:offset + length]).decode('utf-8'),
+                        "char_count": char_count
+                    }
+
+    def get_page(self, pdf_hash: str, page_number: int) -> Optional[Dict]:
+        """Read a single cached page, or None if it was blank or is not cached."""
+        for page in self.iter_pages(pdf_hash, start_page=page_number):
+            return page if page["page_number"] == page_number else None
+        return None
+
+    @contextmanager
+    def writer(self, pdf_hash: str, toc: List[List]):
+        """Context manager that writes a cache entry, published only on success."""
+        path = self.path_for(pdf_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(MAGIC)
+                writer = _CacheWriter(f)
+                yield writer
+                footer = json.dumps({
+                    "text_version": TEXT_VERSION,
+                    "toc": toc,
+                    "pages": writer.index
+                }).encode('utf-8')
+                f.write(footer)
+                f.write(FOOTER_LEN.pack(len(footer)))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def cached_pages(self, pdf_hash: str, pages: Iterator[Dict], toc: List[List]) -> Iterator[Dict]:
+        """Pass ``pages`` through while writing them to the cache.
+
+        The entry is only published if the iterator is consumed completely.
+        """
+        with self.writer(pdf_hash, toc) as writer:
+            for page in pages:
+                writer.add(page)
+                yield page
@@ -2,112 +2,418 @@
 import os
 import json
 import re
-from typing import Dict, List, Tuple
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import fitz  # PyMuPDF
 
+from extraction_store import JSONL_SUFFIX, write_extraction
+from dedup import page_fingerprint, mark_duplicate_sections
+
+# Bump TEXT_VERSION when page text extraction changes and RULES_VERSION when
+# the section/formula heuristics change; the batch manifest keys off both.
+TEXT_VERSION = 1
+RULES_VERSION = 5
+EXTRACTOR_VERSION = f"{TEXT_VERSION}.{RULES_VERSION}"
+
+# Below this many pages per shard the process start-up cost outweighs the gain
+MIN_PAGES_PER_SHARD = 50
+
+# Fallback section headers for PDFs without an outline. A header must make
+# up the whole line, so running text that merely mentions "summary" is ignored.
+HEADER_PATTERN = re.compile(
+    r'^(?:(?:READING|CHAPTER) \d+\b.{0,80}'
+    r'|LEARNING OUTCOME STATEMENTS|SUMMARY|PRACTICE PROBLEMS)$',
+    re.IGNORECASE
+)
+
+# Deepest outline level that starts its own section (readings and their
+# numbered subsections; deeper entries stay inside their parent)
+TOC_MAX_DEPTH = 3
+
+FORMULA_SYMBOLS = ['/', '*', '+', '-', '^', '(', ')']
+FORMULA_PATTERN = re.compile(r'[A-Z][a-z]?\s*=')
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash a file in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _page_record(page_num: int, text: str) -> Dict:
+    """Build the per-page dict stored in extraction results."""
+    return {
+        "page_number": page_num + 1,
+        "text": text,
+        "char_count": len(text)
+    }
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Dict]:
+    """Extract pages [start, end) using a dedicated fitz handle.
+
+    Module-level so it can be pickled into a process pool worker.
+    """
+    pages = []
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(start, end):
+            text = doc[page_num].get_text()
+            if text.strip():
+                pages.append(_page_record(page_num, text))
+    finally:
+        doc.close()
+    return pages
+
+def shard_page_ranges(page_count: int, shards: int) -> List[Tuple[int, int]]:
+    """Split ``page_count`` pages into at most ``shards`` contiguous ranges."""
+    shards = max(1, min(shards, page_count // MIN_PAGES_PER_SHARD or 1))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+def iter_page_lines(pages: Iterable[Dict]) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_number, stripped_line)`` for every non-blank line.
+
+    Equivalent to splitting the ``'\\n\\n'``-joined document, but only one
+    page is held at a time.
+    """
+    for page in pages:
+        for line in StringIO(page["text"]):
+            line = line.strip()
+            if line:
+                yield page["page_number"], line
+
+def _title_key(title: str) -> str:
+    """Normalize a heading for case/spacing-insensitive comparison."""
+    return re.sub(r'[^a-z0-9]+', '', title.lower())
+
+def build_toc_anchors(toc: List[List], max_depth: int = TOC_MAX_DEPTH) -> List[Dict]:
+    """Turn ``doc.get_toc()`` entries into page-ordered section anchors.
+
+    Outline order is kept. An entry pointing before the previous anchor's
+    page is dropped: the bundled volumes end their outline with a
+    ``Glossary`` entry whose target is page 1, which would otherwise turn
+    the front matter into a "Glossary" section.
+    """
+    anchors = []
+    ancestors: Dict[int, str] = {}
+    last_page = 0
+    for entry in toc:
+        depth, title, page = entry[0], entry[1], entry[2]
+        title = re.sub(r'\s+', ' ', title).strip()
+        if page < last_page:
+            continue
+        ancestors[depth] = title
+        if depth > max_depth or page < 1 or not title:
+            continue
+        parent = next((ancestors[d] for d in range(depth - 1, 0, -1) if d in ancestors), None)
+        # "Learning Module 1<TAB>Name" is printed as just "Name" on the page
+        keys = {_title_key(title), _title_key(entry[1].split('\t')[-1])}
+        anchors.append({
+            "title": title,
+            "depth": depth,
+            "parent": parent,
+            "page": page,
+            "keys": [k for k in keys if k]
+        })
+        last_page = page
+    return anchors
+
+class ExtractionScanner:
+    """Single-pass section and formula detector fed one line at a time.
+
+    When the PDF has an outline, sections start at its page anchors. Lines
+    are buffered one page at a time so each outline entry can be placed on
+    the line carrying its full heading (preferring the upper-case heading
+    over the running head); an entry whose heading is not found opens at the top
+    of its page. Without an outline, lines matching ``HEADER_PATTERN``
+    start sections.
+    """
+
+    def __init__(self, toc: Optional[List[List]] = None):
+        self.sections: List[Dict] = []
+        self.formulas: List[Dict] = []
+        self._current_section: Optional[Dict] = None
+        self._current_text: List[str] = []
+        self._anchors = deque(build_toc_anchors(toc)) if toc else None
+        self._page_lines: List[str] = []
+        self._page_number: Optional[int] = None
+
+    @property
+    def uses_toc(self) -> bool:
+        return self._anchors is not None
+
+    def is_header(self, line: str) -> bool:
+        """Check if a line is a section header (fallback mode)."""
+        return len(line) <= 100 and HEADER_PATTERN.match(line) is not None
+
+    def is_formula(self, line: str) -> bool:
+        """Check if a line looks like a mathematical formula."""
+        # Look for lines with common math symbols and equals signs
+        if '=' in line and any(char in line for char in FORMULA_SYMBOLS):
+            # Check if it's likely a formula (not just regular text with =)
+            return len(line) < 200 and FORMULA_PATTERN.search(line) is not None
+        return False
+
+    def feed(self, page_number: Optional[int], line: str):
+        """Consume one stripped, non-empty line."""
+        if self.is_formula(line):
+            self.formulas.append({"formula": line, "page": page_number})
+
+        if self._anchors is None:
+            if self.is_header(line):
+                self._start_section({"title": line}, page_number)
+            elif self._current_section:
+                self._current_text.append(line)
+            return
+
+        if page_number != self._page_number:
+            self._flush_page()
+            self._page_number = page_number
+        self._page_lines.append(line)
+
+    def _flush_page(self):
+        """Split the buffered page at the headings of its outline entries."""
+        lines, page_number = self._page_lines, self._page_number
+        self._page_lines = []
+        if not lines:
+            return
+
+        on_page = []
+        while self._anchors and self._anchors[0]["page"] <= (page_number or 0):
+            on_page.append(self._anchors.popleft())
+        if not on_page:
+            if self._current_section:
+                self._current_text.extend(lines)
+            return
+
+        keys = [_title_key(line) for line in lines]
+        # (line index, heading line count, anchor); unmatched entries open at the top
+        starts = []
+        cursor = 0
+        for anchor in on_page:
+            match = self._find_heading(lines, keys, cursor, anchor)
+            if match:
+                starts.append((match[0], match[1], anchor))
+                cursor = match[0] + match[1]
+            elif not starts:
+                starts.append((0, 0, anchor))
+        starts.sort(key=lambda item: item[0])
+
+        position = 0
+        for index, heading_lines, anchor in starts:
+            if self._current_section:
+                self._current_text.extend(lines[position:index])
+            self._start_section(anchor, page_number)
+            position = index + heading_lines
+        if self._current_section:
+            self._current_text.extend(lines[position:])
+
+    @staticmethod
+    def _find_heading(lines: List[str], keys: List[str], start: int,
+                      anchor: Dict) -> Optional[Tuple[int, int]]:
+        """Locate an outline heading (possibly wrapped) at or after ``start``."""
+        matches = []
+        for i in range(start, len(lines)):
+            key = keys[i]
+            for anchor_key in anchor["keys"]:
+                if key and len(key) >= min(12, len(anchor_key)) and anchor_key.startswith(key):
+                    # Absorb continuation lines of a wrapped heading
+                    rest, j = anchor_key[len(key):], i + 1
+                    while rest and j < len(lines) and keys[j] and rest.startswith(keys[j]):
+                        rest, j = rest[len(keys[j]):], j + 1
+                    matches.append((not rest, lines[i].isupper(), -i, j - i))
+                    break
+        if not matches:
+            return None
+        # Prefer complete headings, then upper-case ones, then the earliest
+        _, _, index, count = max(matches)
+        return -index, count
+
+    def _start_section(self, anchor: Dict, page_number: Optional[int]):
+        # Save previous section and start a new one
+        self._flush_section()
+        self._current_section = {k: v for k, v in anchor.items() if k not in ("keys", "page")}
+        self._current_section["page"] = page_number
+        self._current_text = []
+
+    def get_state(self) -> Dict:
+        """JSON-serializable snapshot, for checkpointing between pages."""
+        return {
+            "sections": self.sections,
+            "formulas": self.formulas,
+            "current_section": self._current_section,
+            "current_text": self._current_text,
+            "anchors": list(self._anchors) if self._anchors is not None else None,
+            "page_lines": self._page_lines,
+            "page_number": self._page_number
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "ExtractionScanner":
+        """Rebuild a scanner from ``get_state()`` output."""
+        scanner = cls()
+        scanner.sections = state["sections"]
+        scanner.formulas = state["formulas"]
+        scanner._current_section = state["current_section"]
+        scanner._current_text = state["current_text"]
+        scanner._anchors = deque(state["anchors"]) if state["anchors"] is not None else None
+        scanner._page_lines = state["page_lines"]
+        scanner._page_number = state["page_number"]
+        return scanner
+
+    def feed_lines(self, lines: Iterable[Tuple[Optional[int], str]]) -> "ExtractionScanner":
+        """Consume an iterator of ``(page_number, line)`` pairs."""
+        for page_number, line in lines:
+            self.feed(page_number, line)
+        return self
+
+    def finish(self) -> Tuple[List[Dict], List[Dict]]:
+        """Flush the open section and return ``(sections, formulas)``."""
+        self._flush_page()
+        self._flush_section()
+        return self.sections, self.formulas
+
+    def _flush_section(self):
+        if self._current_section and self._current_text:
+            section = {
+                "title": self._current_section["title"],
+                "content": '\n'.join(self._current_text),
+                "page": self._current_section["page"]
+            }
+            if "depth" in self._current_section:
+                section["depth"] = self._current_section["depth"]
+                section["parent"] = self._current_section["parent"]
+            self.sections.append(section)
+        self._current_text = []
+
 class CFAPDFExtractor:
     """Extract content from CFA PDF files."""
 
-    def __init__(self, pdf_dir: str, output_dir: str):
+    def __init__(self, pdf_dir: str, output_dir: str, shards: int = 1,
+                 output_format: str = "json", page_cache=None, checkpoints=None,
+                 resume: bool = False):
+        if output_format not in ("json", "jsonl"):
+            raise ValueError(f"Unknown output format: {output_format}")
         self.pdf_dir = pdf_dir
         self.output_dir = output_dir
+        self.shards = max(1, shards)
+        self.output_format = output_format
+        # Optional page_cache.PageTextCache; when set, raw page text is read
+        # from / written to it so heuristics can be re-run without fitz
+        self.page_cache = page_cache
+        # Optional extraction_checkpoint.CheckpointStore; with ``resume`` an
+        # interrupted volume continues from its last checkpoint, otherwise
+        # stale checkpoints are discarded and extraction starts over
+        self.checkpoints = checkpoints
+        self.resume = resume
         os.makedirs(output_dir, exist_ok=True)
 
-    def extract_text_from_pdf(self, pdf_path: str) -> List[Dict]:
-        """Extract text from PDF page by page."""
+    def iter_pages(self, pdf_path: str, shards: int = None,
+                   start_page: int = 1) -> Iterator[Dict]:
+        """Lazily yield non-empty pages in page order, from ``start_page`` on.
+
+        With ``shards > 1`` the document is read in page-range blocks by a
+        process pool, each worker opening its own fitz handle. Only a small
+        window of blocks is in flight, so memory stays bounded, and blocks
+        are yielded back in page order so sections spanning a shard boundary
+        are stitched exactly as in a serial read.
+        """
+        shards = self.shards if shards is None else max(1, shards)
+        first = max(0, start_page - 1)
+        with fitz.open(pdf_path) as doc:
+            page_count = len(doc)
+            workers = len(shard_page_ranges(max(0, page_count - first), shards))
+            if workers == 1:
+                for page_num in range(first, page_count):
+                    text = doc[page_num].get_text()
+                    if text.strip():
+                        yield _page_record(page_num, text)
+                return
+
+        blocks = deque((start, min(start + MIN_PAGES_PER_SHARD, page_count))
+                       for start in range(first, page_count, MIN_PAGES_PER_SHARD))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            in_flight = deque()
+            while blocks or in_flight:
+                while blocks and len(in_flight) < workers * 2:
+                    start, end = blocks.popleft()
+                    in_flight.append(executor.submit(_extract_page_range, pdf_path, start, end))
+                yield from in_flight.popleft().result()
+
+    def extract_text_from_pdf(self, pdf_path: str, shards: int = None) -> List[Dict]:
+        """Extract text from PDF page by page (see ``iter_pages``)."""
         pages = []
         try:
-            doc = fitz.open(pdf_path)
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                if text.strip():
-                    pages.append({
-                        "page_number": page_num + 1,
-                        "text": text,
-                        "char_count": len(text)
-                    })
-            doc.close()
+            for page in self.iter_pages(pdf_path, shards):
+                pages.append(page)
         except Exception as e:
             print(f"Error extracting from {pdf_path}: {e}")
         return pages
 
+    def read_toc(self, pdf_path: str) -> List[List]:
+        """Read the PDF outline as ``[depth, title, page]`` entries."""
+        try:
+            with fitz.open(pdf_path) as doc:
+                return doc.get_toc(simple=True)
+        except Exception as e:
+            print(f"Could not read outline from {pdf_path}: {e}")
+            return []
+
     def parse_level_and_volume(self, filename: str) -> Tuple[str, int]:
         """Parse level and volume from filename."""
         # Example: "CFA L1 (V1).pdf" -> ("L1", 1)
-        match = re.search(r'CFA L(\d) \(V(\d)\)', filename)
+        match = re.search(r'CFA L(\d) \(V(\d+)\)', filename)
         if match:
             level = f"L{match.group(1)}"
             volume = int(match.group(2))
             return level, volume
         return None, None
 
+    @staticmethod
+    def output_filename(level: str, volume: int, output_format: str = "json") -> str:
+        """Name of the file written for a volume in the given format."""
+        suffix = JSONL_SUFFIX if output_format == "jsonl" else ".json"
+        return f"{level}_V{volume}_extracted{suffix}"
+
     def extract_sections(self, text: str) -> List[Dict]:
         """Extract sections/chapters from text."""
-        # This is a simplified version - you may need to adjust based on PDF structure
-        sections = []
-
-        # Look for common section headers
-        section_patterns = [
-            r'READING \d+',
-            r'CHAPTER \d+',
-            r'LEARNING OUTCOME STATEMENTS',
-            r'SUMMARY',
-            r'PRACTICE PROBLEMS'
-        ]
-
-        current_section = None
-        current_text = []
-
-        for line in text.split('\n'):
+        scanner = ExtractionScanner()
+        for line in StringIO(text):
             line = line.strip()
-            if not line:
-                continue
-
-            # Check if this is a section header
-            is_header = any(re.search(pattern, line, re.IGNORECASE) for pattern in section_patterns)
-
-            if is_header:
-                # Save previous section
-                if current_section and current_text:
-                    sections.append({
-                        "title": current_section,
-                        "content": '\n'.join(current_text)
-                    })
-                # Start new section
-                current_section = line
-                current_text = []
-            elif current_section:
-                current_text.append(line)
-
-        # Save last section
-        if current_section and current_text:
-            sections.append({
-                "title": current_section,
-                "content": '\n'.join(current_text)
-            })
-
+            if line:
+                scanner.feed(None, line)
+        sections, _ = scanner.finish()
+        for section in sections:
+            del section["page"]
         return sections
 
     def extract_formulas(self, text: str) -> List[str]:
         """Extract mathematical formulas from text."""
-        formulas = []
-
-        # Look for common formula patterns
-        # This is simplified - may need enhancement
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            # Look for lines with common math symbols and equals signs
-            if '=' in line and any(char in line for char in ['/', '*', '+', '-', '^', '(', ')']):
-                # Check if it's likely a formula (not just regular text with =)
-                if len(line) < 200 and re.search(r'[A-Z][a-z]?\s*=', line):
-                    formulas.append(line)
-
-        return formulas
-
-    def process_pdf(self, pdf_filename: str) -> Dict:
-        """Process a single PDF file."""
+        scanner = ExtractionScanner()
+        return [line.strip() for line in StringIO(text) if scanner.is_formula(line.strip())]
+
+    def process_pdf(self, pdf_filename: str, pdf_hash: str = None,
+                    progress: Callable[[int], None] = None) -> Dict:
+        """Process a single PDF file.
+
+        Pages are streamed through a single ``ExtractionScanner`` pass, so
+        the whole volume is never concatenated into one string. With a page
+        cache, a PDF whose text is already cached (keyed by ``pdf_hash``,
+        computed if not given) is re-scanned without opening it in fitz.
+        ``progress``, if given, is called with each page number as it is read.
+        With a checkpoint store the scan state is saved every few pages and,
+        when resuming, restored instead of re-reading the pages before it.
+        """
         pdf_path = os.path.join(self.pdf_dir, pdf_filename)
         level, volume = self.parse_level_and_volume(pdf_filename)
 
@@ -117,40 +423,124 @@ class CFAPDFExtractor:
 
         print(f"Processing {pdf_filename} - {level} Volume {volume}...")
 
-        # Extract pages
-        pages = self.extract_text_from_pdf(pdf_path)
+        if self.page_cache is not None or self.checkpoints is not None:
+            pdf_hash = pdf_hash or file_sha256(pdf_path)
+
+        checkpoint = None
+        if self.checkpoints is not None:
+            if self.resume:
+                checkpoint = self.checkpoints.load(pdf_hash)
+            else:
+                self.checkpoints.discard(pdf_hash)
+
+        if checkpoint:
+            stats = checkpoint["progress"]
+            start_page = checkpoint["last_page"] + 1
+            print(f"  Resuming from page {start_page}")
+        else:
+            stats = {
+                "total_pages": 0,
+                "total_chars": 0,
+                "sample_pages": [],
+                "first_seen": {},  # page fingerprint -> first page number
+                "duplicate_pages": [],
+                "text_source": "pdf"
+            }
+            start_page = 1
+
+        toc = None
+        if self.page_cache is not None and self.page_cache.has(pdf_hash):
+            stats["text_source"] = "page_cache"
+            pages = self.page_cache.iter_pages(pdf_hash, start_page=start_page)
+            if not checkpoint:
+                toc = self.page_cache.read_toc(pdf_hash)
+        elif checkpoint:
+            # The page cache is only written by complete, uninterrupted passes
+            pages = self.iter_pages(pdf_path, start_page=start_page)
+        else:
+            toc = self.read_toc(pdf_path)
+            pages = self.iter_pages(pdf_path)
+            if self.page_cache is not None:
+                pages = self.page_cache.cached_pages(pdf_hash, pages, toc)
+
+        def counted_pages():
+            for page in pages:
+                if stats["total_pages"] < 5:
+                    stats["sample_pages"].append(page)
+                stats["total_pages"] += 1
+                # Matches len('\n\n'.join(page texts))
+                stats["total_chars"] += page["char_count"] + (2 if stats["total_pages"] > 1 else 0)
+                if progress:
+                    progress(page["page_number"])
+                # Repeated boilerplate pages (copyright, problem headers...)
+                fingerprint = page_fingerprint(page["text"])
+                if fingerprint is None:
+                    pass
+                elif fingerprint in stats["first_seen"]:
+                    stats["duplicate_pages"].append(
+                        [page["page_number"], stats["first_seen"][fingerprint]])
+                else:
+                    stats["first_seen"][fingerprint] = page["page_number"]
+                yield page
+
+        # Prefer the PDF outline for sectioning; fall back to header lines
+        if checkpoint:
+            scanner = ExtractionScanner.from_state(checkpoint["scanner"])
+        else:
+            scanner = ExtractionScanner(toc=toc)
+        try:
+            for page in counted_pages():
+                scanner.feed_lines(iter_page_lines((page,)))
+                if self.checkpoints is not None and stats["total_pages"] % self.checkpoints.every == 0:
+                    self.checkpoints.save(pdf_hash, page["page_number"], scanner.get_state(), stats)
+        except Exception as e:
+            print(f"Error extracting from {pdf_path}: {e}")
+            return None
 
-        if not pages:
+        total_pages = stats["total_pages"]
+        duplicate_pages = stats["duplicate_pages"]
+        if not total_pages:
             print(f"No content extracted from {pdf_filename}")
             return None
 
-        # Combine all text
-        full_text = '\n\n'.join([p['text'] for p in pages])
-
-        # Extract sections
-        sections = self.extract_sections(full_text)
-
-        # Extract formulas
-        formulas = self.extract_formulas(full_text)
+        sections, formulas = scanner.finish()
+        duplicate_sections = mark_duplicate_sections(sections)
+        if duplicate_pages or duplicate_sections:
+            print(f"  {len(duplicate_pages)} repeated pages, "
+                  f"{duplicate_sections} near-duplicate sections")
 
         # Prepare extracted data
         extracted_data = {
             "filename": pdf_filename,
+            "source_sha256": pdf_hash,
             "level": level,
             "volume": volume,
-            "total_pages": len(pages),
-            "total_chars": len(full_text),
+            "total_pages": total_pages,
+            "total_chars": stats["total_chars"],
+            "extractor_version": EXTRACTOR_VERSION,
+            "sectioning": "toc" if scanner.uses_toc else "headers",
+            "text_source": stats["text_source"],
             "sections": sections,
             "formulas": formulas,
-            "pages": pages[:5]  # Store first 5 pages as sample
+            "duplicate_pages": duplicate_pages,  # [page, first page with same text]
+            "pages": stats["sample_pages"]  # Store first 5 pages as sample
         }
 
-        # Save to JSON
-        output_filename = f"{level}_V{volume}_extracted.json"
+        # Save as pretty JSON or compressed JSONL + offset index
+        output_filename = self.output_filename(level, volume, self.output_format)
         output_path = os.path.join(self.output_dir, output_filename)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+        if self.output_format == "jsonl":
+            write_extraction(extracted_data, output_path)
+        else:
+            # Write then rename, so a crash never leaves a truncated volume
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, output_path)
+
+        if self.checkpoints is not None:
+            self.checkpoints.discard(pdf_hash)
 
         print(f"Saved extracted data to {output_filename}")
         return extracted_data
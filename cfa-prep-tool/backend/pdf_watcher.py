@@ -0,0 +1,89 @@
+"""Poll the pdfs/levelN folders and report PDFs once they stop changing.
+
+Polling (one ``scandir`` per folder per interval) keeps this portable and
+dependency-free. A new or modified PDF is only reported after its size and
+mtime have been stable for ``debounce`` seconds, so a file that is still
+being copied in is not extracted half-written.
+"""
+import os
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 5.0
+DEFAULT_DEBOUNCE = 10.0
+
+class PdfFolderWatcher:
+    """Detect new or changed PDFs under ``pdf_base/<folder>``."""
+
+    def __init__(self, pdf_base: str, folders: Iterable[str],
+                 interval: float = DEFAULT_INTERVAL, debounce: float = DEFAULT_DEBOUNCE):
+        self.pdf_base = pdf_base
+        self.folders = list(folders)
+        self.interval = interval
+        self.debounce = debounce
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        # path -> (size/mtime signature, time that signature was first seen)
+        self._pending: Dict[str, Tuple[Tuple[int, int], float]] = {}
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Current (size, mtime_ns) of every PDF in the watched folders."""
+        files = {}
+        for folder in self.folders:
+            try:
+                entries = list(os.scandir(os.path.join(self.pdf_base, folder)))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name.endswith('.pdf') and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def prime(self):
+        """Treat every PDF present now as already handled."""
+        self._seen = self.snapshot()
+        self._pending.clear()
+
+    def poll(self, now: Optional[float] = None) -> List[str]:
+        """Return PDFs that changed and have since been stable for ``debounce``."""
+        now = time.monotonic() if now is None else now
+        current = self.snapshot()
+        ready = []
+        for path, signature in current.items():
+            if self._seen.get(path) == signature:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                # New, or still being written: restart its quiet period
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.debounce:
+                ready.append(path)
+                self._seen[path] = signature
+                del self._pending[path]
+
+        for path in set(self._seen) - set(current):
+            del self._seen[path]
+        for path in set(self._pending) - set(current):
+            del self._pending[path]
+        return sorted(ready)
+
+    def run(self, on_ready: Callable[[List[str]], None],
+            stop_event: Optional[threading.Event] = None):
+        """Poll every ``interval`` seconds until ``stop_event`` is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.wait(self.interval):
+            ready = self.poll()
+            if ready:
+                try:
+                    on_ready(ready)
+                except Exception as e:
+                    print(f"⚠️  Watcher callback failed: {e}")
+
+    def start(self, on_ready: Callable[[List[str]], None]) -> threading.Event:
+        """Run the watcher in a daemon thread; set the returned event to stop it."""
+        stop_event = threading.Event()
+        threading.Thread(target=self.run, args=(on_ready, stop_event),
+                         name="pdf-watcher", daemon=True).start()
+        return stop_event
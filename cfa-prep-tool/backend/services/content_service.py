@@ -0,0 +1,284 @@
+"""Service for persisting and querying extracted CFA source content."""
+from bisect import bisect_right
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from typing import List, Dict, Optional
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from models import CFAContent, Flashcard, QuizQuestion
+from dedup import MinHashIndex, minhash, section_sketch, encode_sketch, decode_sketch
+from formula_index import FormulaIndex
+
+# Content types written by the PDF ingestion stage
+INGESTED_TYPES = ("section", "formula")
+
+# Seconds between checks of cfa_content for formula changes; lookups in
+# between are served from the in-memory index without touching the DB
+FORMULA_INDEX_TTL = 30
+
+_formula_index = {"index": None, "stamp": None, "checked_at": 0.0}
+
+class ContentService:
+    """Service for loading extracted PDF content into cfa_content."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _rows_for_result(self, result: Dict, seen: Optional[MinHashIndex] = None) -> List[Dict]:
+        """Flatten one extraction result into cfa_content row mappings.
+
+        Sections the extractor flagged as near-duplicates (``duplicate_of``)
+        are skipped, as are sections matching one already in ``seen``
+        (a MinHash index shared across the volumes of one ingestion run).
+        Each section row carries its sketch, so later runs need not redo it.
+        """
+        level = result["level"]
+        volume = result["volume"]
+        sections = result.get("sections", [])
+        rows = []
+
+        for position, section in enumerate(sections):
+            if section.get("duplicate_of") is not None:
+                continue
+            sketch = section_sketch(section)
+            if sketch is not None and seen is not None:
+                if seen.find(sketch) is not None:
+                    continue
+                seen.add((level, volume, position), sketch)
+            rows.append({
+                "level": level,
+                "volume": volume,
+                "topic": section["title"],
+                "subtopic": section.get("parent"),
+                "content": section["content"],
+                "content_type": "section",
+                "page_number": section.get("page"),
+                "minhash": encode_sketch(sketch) if sketch is not None else ""
+            })
+
+        # Attach each formula to the section it appears in
+        section_pages = [s.get("page") or 0 for s in sections]
+        for formula in result.get("formulas", []):
+            if isinstance(formula, str):
+                formula = {"formula": formula, "page": None}
+            index = bisect_right(section_pages, formula.get("page") or 0) - 1
+            rows.append({
+                "level": level,
+                "volume": volume,
+                "topic": sections[index]["title"] if sections and index >= 0 else None,
+                "subtopic": None,
+                "content": formula["formula"],
+                "content_type": "formula",
+                "page_number": formula.get("page"),
+                "minhash": None
+            })
+
+        return rows
+
+    def ingest_extracted(self, results: List[Dict], batch_size: int = 1000) -> Dict:
+        """Bulk-load extraction results in a single transaction.
+
+        Rows are matched to the stored section/formula rows of their
+        (level, volume) on a natural key (see ``_natural_keys``): matches are
+        updated in place and keep their ids, so flashcards and questions
+        linked through ``content_id`` survive a re-run; new rows are inserted
+        and rows no longer extracted are deleted (unlinking their cards).
+        Re-ingesting the same volume is therefore idempotent.
+
+        Near-duplicate sections, within a volume, of a section from an
+        earlier volume in ``results`` or of a section already stored for
+        another volume, are not stored; ``counts["duplicates"]`` reports how
+        many were dropped.
+        """
+        counts = {"volumes": 0, "sections": 0, "formulas": 0, "duplicates": 0}
+        try:
+            seen = self._stored_sketches({(r["level"], r["volume"]) for r in results})
+            for result in results:
+                rows = self._rows_for_result(result, seen)
+                self._upsert_volume(result["level"], result["volume"], rows, batch_size)
+
+                section_rows = sum(1 for row in rows if row["content_type"] == "section")
+                counts["volumes"] += 1
+                counts["sections"] += section_rows
+                counts["formulas"] += len(result.get("formulas", []))
+                counts["duplicates"] += len(result.get("sections", [])) - section_rows
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        _formula_index["checked_at"] = 0.0  # re-check on the next lookup
+        return counts
+
+    @staticmethod
+    def _natural_keys(rows: List[Dict]) -> List[tuple]:
+        """Identity of each row within its volume: (type, page, title or formula, n).
+
+        ``n`` numbers rows that would otherwise share a key, in order, so the
+        same extraction maps to the same keys on every run.
+        """
+        occurrences = Counter()
+        keys = []
+        for row in rows:
+            base = (row["content_type"], row["page_number"],
+                    row["topic"] if row["content_type"] == "section" else row["content"])
+            keys.append(base + (occurrences[base],))
+            occurrences[base] += 1
+        return keys
+
+    def _upsert_volume(self, level: str, volume: int, rows: List[Dict], batch_size: int):
+        """Make the volume's stored section/formula rows match ``rows``, keeping ids."""
+        existing = self.db.query(
+            CFAContent.id, CFAContent.content_type, CFAContent.page_number,
+            CFAContent.topic, CFAContent.content
+        ).filter(
+            CFAContent.level == level,
+            CFAContent.volume == volume,
+            CFAContent.content_type.in_(INGESTED_TYPES)
+        ).order_by(CFAContent.id).all()
+        ids = dict(zip(self._natural_keys([row._asdict() for row in existing]),
+                       (row.id for row in existing)))
+
+        inserts, updates = [], []
+        for key, row in zip(self._natural_keys(rows), rows):
+            row_id = ids.pop(key, None)
+            if row_id is None:
+                inserts.append(row)
+            else:
+                updates.append(dict(row, id=row_id))
+
+        stale = list(ids.values())
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            for model in (Flashcard, QuizQuestion):
+                self.db.query(model).filter(model.content_id.in_(batch)).update(
+                    {"content_id": None}, synchronize_session=False)
+            self.db.query(CFAContent).filter(CFAContent.id.in_(batch)).delete(synchronize_session=False)
+        for start in range(0, len(updates), batch_size):
+            self.db.bulk_update_mappings(CFAContent, updates[start:start + batch_size])
+        for start in range(0, len(inserts), batch_size):
+            self.db.bulk_insert_mappings(CFAContent, inserts[start:start + batch_size])
+
+    def _stored_sketches(self, exclude: set) -> MinHashIndex:
+        """MinHash index of the stored sections of volumes not in ``exclude``.
+
+        Uses the sketch stored with each row. Rows ingested before sketches
+        were stored get theirs computed from title and content (the same
+        text ``mark_duplicate_sections`` sketches) and saved with this run,
+        so re-ingesting one volume drops the same cross-volume duplicates as
+        a full run did.
+        """
+        sketches = {}
+        rows = self.db.query(
+            CFAContent.id, CFAContent.level, CFAContent.volume, CFAContent.minhash
+        ).filter(CFAContent.content_type == "section", CFAContent.minhash.isnot(None))
+        for row_id, level, volume, stored in rows:
+            if (level, volume) not in exclude and stored:
+                sketches[row_id] = (level, volume, decode_sketch(stored))
+
+        backfill = []
+        legacy = self.db.query(
+            CFAContent.id, CFAContent.level, CFAContent.volume, CFAContent.topic, CFAContent.content
+        ).filter(CFAContent.content_type == "section", CFAContent.minhash.is_(None))
+        for row_id, level, volume, title, content in legacy:
+            if (level, volume) in exclude:
+                continue
+            sketch = minhash(f"{title}\n{content}")
+            backfill.append({"id": row_id, "minhash": encode_sketch(sketch) if sketch is not None else ""})
+            if sketch is not None:
+                sketches[row_id] = (level, volume, sketch)
+        if backfill:
+            self.db.bulk_update_mappings(CFAContent, backfill)
+
+        index = MinHashIndex()
+        for row_id in sorted(sketches):
+            level, volume, sketch = sketches[row_id]
+            index.add((level, volume, "stored", row_id), sketch)
+        return index
+
+    def has_volume(self, level: str, volume: int) -> bool:
+        """Check whether a volume has already been ingested."""
+        return self.db.query(CFAContent.id).filter(
+            CFAContent.level == level,
+            CFAContent.volume == volume,
+            CFAContent.content_type.in_(INGESTED_TYPES)
+        ).first() is not None
+
+    def get_content(self, level: Optional[str] = None, volume: Optional[int] = None,
+                    content_type: Optional[str] = None, topic: Optional[str] = None,
+                    limit: int = 50, offset: int = 0) -> List[CFAContent]:
+        """Get source content with optional filters, in page order."""
+        query = self.db.query(CFAContent)
+
+        if level:
+            query = query.filter(CFAContent.level == level)
+        if volume:
+            query = query.filter(CFAContent.volume == volume)
+        if content_type:
+            query = query.filter(CFAContent.content_type == content_type)
+        if topic:
+            query = query.filter(CFAContent.topic.ilike(f"%{topic}%"))
+
+        return query.order_by(
+            CFAContent.level, CFAContent.volume, CFAContent.page_number, CFAContent.id
+        ).offset(offset).limit(limit).all()
+
+    def formula_rows(self) -> List[tuple]:
+        """All ingested formulas as (content, level, volume, page_number, topic)."""
+        return self.db.query(
+            CFAContent.content, CFAContent.level, CFAContent.volume,
+            CFAContent.page_number, CFAContent.topic
+        ).filter(CFAContent.content_type == "formula").order_by(
+            CFAContent.level, CFAContent.volume, CFAContent.page_number, CFAContent.id
+        ).all()
+
+    def formula_stamp(self) -> tuple:
+        """Cheap change marker for the formula rows: (count, max id)."""
+        return tuple(self.db.query(
+            func.count(CFAContent.id), func.max(CFAContent.id)
+        ).filter(CFAContent.content_type == "formula").one())
+
+    def get_formula_index(self, max_age: float = FORMULA_INDEX_TTL) -> FormulaIndex:
+        """Shared formula index, rebuilt when the formula rows have changed.
+
+        The change check runs at most every ``max_age`` seconds (pass 0 to
+        force it), so batch ingestion from another process shows up after
+        at most that delay.
+        """
+        cache = _formula_index
+        now = time.monotonic()
+        if cache["index"] is None or now - cache["checked_at"] >= max_age:
+            stamp = self.formula_stamp()
+            if cache["index"] is None or stamp != cache["stamp"]:
+                cache["index"] = FormulaIndex.from_rows(self.formula_rows())
+                cache["stamp"] = stamp
+            cache["checked_at"] = now
+        return cache["index"]
+
+    def get_volumes(self) -> List[Dict]:
+        """Summarize ingested volumes with section and formula counts."""
+        rows = self.db.query(
+            CFAContent.level,
+            CFAContent.volume,
+            CFAContent.content_type,
+            func.count(CFAContent.id)
+        ).group_by(
+            CFAContent.level, CFAContent.volume, CFAContent.content_type
+        ).all()
+
+        volumes = {}
+        for level, volume, content_type, count in rows:
+            entry = volumes.setdefault((level, volume), {
+                "level": level, "volume": volume, "sections": 0, "formulas": 0
+            })
+            if content_type == "section":
+                entry["sections"] = count
+            elif content_type == "formula":
+                entry["formulas"] = count
+
+        return [volumes[key] for key in sorted(volumes)]
@@ -1,17 +1,21 @@
 """Flashcard service with spaced repetition algorithm."""
 from datetime import datetime, timedelta
+import asyncio
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from models import Flashcard, FlashcardReview, LearningProgress
-from content_analyzer_hybrid import HybridContentAnalyzer as ContentAnalyzer
+from content_analyzer_hybrid import HybridContentAnalyzer as ContentAnalyzer, Deadline
 
 class FlashcardService:
     """Service for managing flashcards and reviews."""
 
+    # Fields a generated flashcard needs before it can be stored
+    REQUIRED_FIELDS = ('front', 'back')
+
     def __init__(self, db: Session, analyzer: ContentAnalyzer = None):
         self.db = db
         self.analyzer = analyzer
@@ -24,14 +28,46 @@ class FlashcardService:
         self.db.refresh(flashcard)
         return flashcard
 
-    def create_flashcards_from_content(self, content: str, topic: str, level: str, count: int = 10) -> List[Flashcard]:
+    def create_flashcards_from_content(self, content: str, topic: str, level: str, count: int = 10,
+                                       deadline: Deadline = None) -> List[Flashcard]:
         """Generate and create flashcards from content using Claude AI."""
         if not self.analyzer:
             raise ValueError("ContentAnalyzer not initialized")
 
         # Generate flashcards using Claude
-        flashcard_data = self.analyzer.generate_flashcards(content, topic, level, count)
+        flashcard_data = self.analyzer.generate_flashcards(content, topic, level, count, deadline)
+        return self.store_generated_flashcards(flashcard_data)
+
+    async def acreate_flashcards_from_content(self, content: str, topic: str, level: str, count: int = 10,
+                                              deadline: Deadline = None) -> List[Flashcard]:
+        """Async ``create_flashcards_from_content`` for async endpoints.
+
+        The model call is awaited; the short database write runs in a worker
+        thread so the event loop is never blocked on SQLite.
+        """
+        if not self.analyzer:
+            raise ValueError("ContentAnalyzer not initialized")
+
+        flashcard_data = await self.analyzer.agenerate_flashcards(content, topic, level, count, deadline)
+        return await asyncio.to_thread(self.store_generated_flashcards, flashcard_data)
+
+    async def astream_flashcards_from_content(self, content: str, topic: str, level: str, count: int = 10,
+                                              deadline: Deadline = None) -> AsyncIterator[Flashcard]:
+        """Generate flashcards and store each one as soon as the model produces it."""
+        if not self.analyzer:
+            raise ValueError("ContentAnalyzer not initialized")
+
+        async for data in self.analyzer.astream_flashcards(content, topic, level, count, deadline):
+            if all(data.get(field) for field in self.REQUIRED_FIELDS):
+                yield await asyncio.to_thread(self._store_streamed, data)
+
+    def _store_streamed(self, data: dict) -> Flashcard:
+        flashcard = self.store_generated_flashcards([data])[0]
+        self.db.refresh(flashcard)
+        return flashcard
 
+    def store_generated_flashcards(self, flashcard_data: List[dict], commit: bool = True) -> List[Flashcard]:
+        """Insert analyzer output as Flashcard rows (only flushed with ``commit=False``)."""
         flashcards = []
         for data in flashcard_data:
             flashcard = Flashcard(
@@ -45,7 +81,10 @@ class FlashcardService:
             self.db.add(flashcard)
             flashcards.append(flashcard)
 
-        self.db.commit()
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
         return flashcards
 
     def get_flashcards(self, level: Optional[str] = None, topic: Optional[str] = None,
@@ -1,19 +1,23 @@
 """Quiz service for generating and managing quizzes."""
 from datetime import datetime
+import asyncio
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from typing import List, Optional, Dict
+from typing import AsyncIterator, List, Optional, Dict
 import sys
 import os
 import random
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from models import QuizQuestion, QuizAttempt, LearningProgress, StudySession
-from content_analyzer_hybrid import HybridContentAnalyzer as ContentAnalyzer
+from content_analyzer_hybrid import HybridContentAnalyzer as ContentAnalyzer, Deadline
 
 class QuizService:
     """Service for managing quizzes and quiz attempts."""
 
+    # Fields a generated question needs before it can be stored
+    REQUIRED_FIELDS = ('question', 'option_a', 'option_b', 'option_c', 'correct_answer', 'explanation')
+
     def __init__(self, db: Session, analyzer: ContentAnalyzer = None):
         self.db = db
         self.analyzer = analyzer
@@ -26,14 +30,42 @@ class QuizService:
         self.db.refresh(question)
         return question
 
-    def create_quiz_from_content(self, content: str, topic: str, level: str, count: int = 5) -> List[QuizQuestion]:
+    def create_quiz_from_content(self, content: str, topic: str, level: str, count: int = 5,
+                                 deadline: Deadline = None) -> List[QuizQuestion]:
         """Generate and create quiz questions from content using Claude AI."""
         if not self.analyzer:
             raise ValueError("ContentAnalyzer not initialized")
 
         # Generate questions using Claude
-        question_data = self.analyzer.generate_quiz_questions(content, topic, level, count)
+        question_data = self.analyzer.generate_quiz_questions(content, topic, level, count, deadline)
+        return self.store_generated_questions(question_data)
+
+    async def acreate_quiz_from_content(self, content: str, topic: str, level: str, count: int = 5,
+                                        deadline: Deadline = None) -> List[QuizQuestion]:
+        """Async ``create_quiz_from_content`` for async endpoints."""
+        if not self.analyzer:
+            raise ValueError("ContentAnalyzer not initialized")
 
+        question_data = await self.analyzer.agenerate_quiz_questions(content, topic, level, count, deadline)
+        return await asyncio.to_thread(self.store_generated_questions, question_data)
+
+    async def astream_quiz_from_content(self, content: str, topic: str, level: str, count: int = 5,
+                                        deadline: Deadline = None) -> AsyncIterator[QuizQuestion]:
+        """Generate quiz questions and store each one as soon as the model produces it."""
+        if not self.analyzer:
+            raise ValueError("ContentAnalyzer not initialized")
+
+        async for data in self.analyzer.astream_quiz_questions(content, topic, level, count, deadline):
+            if all(data.get(field) for field in self.REQUIRED_FIELDS):
+                yield await asyncio.to_thread(self._store_streamed, data)
+
+    def _store_streamed(self, data: Dict) -> QuizQuestion:
+        question = self.store_generated_questions([data])[0]
+        self.db.refresh(question)
+        return question
+
+    def store_generated_questions(self, question_data: List[Dict], commit: bool = True) -> List[QuizQuestion]:
+        """Insert analyzer output as QuizQuestion rows (only flushed with ``commit=False``)."""
         questions = []
         for data in question_data:
             question = QuizQuestion(
@@ -53,7 +85,10 @@ class QuizService:
             self.db.add(question)
             questions.append(question)
 
-        self.db.commit()
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
         return questions
 
     def get_questions(self, level: Optional[str] = None, topic: Optional[str] = None,
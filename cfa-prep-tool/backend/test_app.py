@@ -135,6 +135,1641 @@ def test_api_health():
         traceback.print_exc()
         return False
 
+def _make_sample_pdf(path, page_count=120):
+    """Write a synthetic CFA-style PDF with readings, formulas and a TOC."""
+    import fitz
+    doc = fitz.open()
+    toc = []
+    for i in range(page_count):
+        page = doc.new_page()
+        lines = []
+        if i % 10 == 0:
+            reading = i // 10 + 1
+            lines.append(f"READING {reading}")
+            toc.append([1, f"READING {reading}", i + 1])
+        lines.append(f"Body text for page {i + 1} about portfolio returns.")
+        lines.append("PV = FV / (1 + r)^n")
+        page.insert_text((72, 72), "\n".join(lines))
+    doc.set_toc(toc)
+    doc.save(path)
+    doc.close()
+
+class _FakeOllama:
+    """Minimal keep-alive HTTP server speaking Ollama's tags/chat endpoints.
+
+    ``responder(payload)`` returns the completion text for a chat request;
+    models listed in ``failing`` answer with HTTP 500. Streaming requests get
+    the text as SSE deltas of ``stream_piece`` characters, ``stream_delay``
+    seconds apart.
+    """
+
+    def __init__(self, responder=None, failing=(), models=("qwen2.5-coder:7b",),
+                 stream_piece=16, stream_delay=0.0):
+        import json
+        import time
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        fake = self
+        self.responder = responder or (lambda payload: "[]")
+        self.failing = set(failing)
+        self.calls = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(200, {"models": [{"name": name} for name in models]})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                fake.calls.append(payload)
+                if payload["model"] in fake.failing:
+                    self._send(500, {"error": "model not loaded"})
+                elif payload.get("stream"):
+                    self._stream(fake.responder(payload))
+                else:
+                    content = fake.responder(payload)
+                    self._send(200, {"choices": [{"message": {"content": content}}]})
+
+            def _chunk(self, text):
+                data = text.encode()
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(content), stream_piece):
+                    delta = {"choices": [{"delta": {"content": content[i:i + stream_piece]}}]}
+                    self._chunk(f"data: {json.dumps(delta)}\n\n")
+                    time.sleep(stream_delay)
+                self._chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        # Clients that gave up (deadline tests) leave broken pipes behind
+        self.server.handle_error = lambda request, client_address: None
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        self._env = {k: os.environ.get(k) for k in ("OLLAMA_BASE_URL", "USE_FINANCE_LLM")}
+        os.environ["OLLAMA_BASE_URL"] = self.base_url
+        os.environ["USE_FINANCE_LLM"] = "false"
+        return self
+
+    def __exit__(self, *exc):
+        for key, value in self._env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        self.server.shutdown()
+        self.server.server_close()
+
+def test_parallel_batch():
+    """Test that a --workers batch writes the same outputs as a serial run."""
+    print("\nTesting parallel batch extraction...")
+    try:
+        import shutil
+        import tempfile
+        from batch_process_pdfs import process_all_levels
+
+        with tempfile.TemporaryDirectory() as tmp:
+            sources = []
+            for volume, pages in ((1, 40), (2, 25), (3, 31)):
+                sources.append(os.path.join(tmp, f"CFA L1 (V{volume}).pdf"))
+                _make_sample_pdf(sources[-1], page_count=pages)
+
+            outputs = {}
+            for workers in (1, 3):
+                base_dir = os.path.join(tmp, f"workers{workers}")
+                os.makedirs(os.path.join(base_dir, "pdfs", "level1"))
+                for source in sources:
+                    shutil.copy(source, os.path.join(base_dir, "pdfs", "level1"))
+                results = process_all_levels(workers=workers, ingest=False, use_page_cache=False,
+                                             base_dir=base_dir)
+                extracted_dir = os.path.join(base_dir, "data", "extracted")
+                files = {}
+                for name in sorted(os.listdir(extracted_dir)):
+                    with open(os.path.join(extracted_dir, name), "rb") as f:
+                        files[name] = f.read()
+                outputs[workers] = (results, files)
+
+            serial, parallel = outputs[1], outputs[3]
+            assert [r["volume"] for r in parallel[0]] == [1, 2, 3]
+            assert parallel[0] == serial[0]
+            assert len(serial[1]) == 3 and parallel[1] == serial[1]
+            print("✓ 3 workers produced the same summaries and files as a serial run")
+
+        return True
+    except Exception as e:
+        print(f"✗ Parallel batch error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_pdf_sharding():
+    """Test that sharded extraction matches a serial read."""
+    print("\nTesting sharded PDF extraction...")
+    try:
+        import tempfile
+        from pdf_extractor import CFAPDFExtractor
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "CFA L1 (V1).pdf")
+            _make_sample_pdf(pdf_path)
+            extractor = CFAPDFExtractor(tmp, tmp)
+
+            serial = extractor.extract_text_from_pdf(pdf_path, shards=1)
+            sharded = extractor.extract_text_from_pdf(pdf_path, shards=2)
+            assert serial == sharded
+            assert [p["page_number"] for p in sharded] == list(range(1, 121))
+            print(f"✓ Sharded extraction matches serial ({len(sharded)} pages)")
+
+        return True
+    except Exception as e:
+        print(f"✗ Extraction error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_toc_sectioning():
+    """Test that sections follow the PDF outline, with a header fallback."""
+    print("\nTesting outline-based sectioning...")
+    try:
+        import tempfile
+        from pdf_extractor import CFAPDFExtractor, build_toc_anchors
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _make_sample_pdf(os.path.join(tmp, "CFA L1 (V1).pdf"), page_count=30)
+            extractor = CFAPDFExtractor(tmp, tmp)
+            result = extractor.process_pdf("CFA L1 (V1).pdf")
+
+            assert result["sectioning"] == "toc"
+            assert [s["page"] for s in result["sections"]] == [1, 11, 21]
+            assert result["sections"][1]["title"] == "READING 2"
+            assert "page 20" in result["sections"][1]["content"]
+            print(f"✓ Outline produced {len(result['sections'])} sections")
+
+            text = "SUMMARY\nKey points\nIn summary, returns compound.\nREADING 4\nBonds"
+            titles = [s["title"] for s in extractor.extract_sections(text)]
+            assert titles == ["SUMMARY", "READING 4"]
+            print("✓ Header fallback ignores inline mentions")
+
+            # Bundled volumes end their outline with a Glossary entry pointing at page 1
+            import fitz
+            doc = fitz.open(os.path.join(tmp, "CFA L1 (V1).pdf"))
+            doc.set_toc(doc.get_toc() + [[1, "Glossary", 1]])
+            doc.save(os.path.join(tmp, "CFA L1 (V2).pdf"))
+            doc.close()
+            anchors = build_toc_anchors([[1, "READING 1", 3], [2, "Intro", 5], [1, "READING 2", 9],
+                                         [2, "Glossary", 1]])
+            assert [a["title"] for a in anchors] == ["READING 1", "Intro", "READING 2"]
+            result = extractor.process_pdf("CFA L1 (V2).pdf")
+            assert [s["title"] for s in result["sections"]] == ["READING 1", "READING 2", "READING 3"]
+            assert "page 30" in result["sections"][-1]["content"]
+            print("✓ Outline entry pointing backwards is dropped")
+
+        return True
+    except Exception as e:
+        print(f"✗ Sectioning error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_extraction_store():
+    """Test the compressed JSONL format: seeks, full loads and index recovery."""
+    print("\nTesting JSONL extraction store...")
+    try:
+        import json
+        import shutil
+        import tempfile
+        from extraction_store import (ExtractionReader, write_extraction, load_extraction,
+                                      find_extraction, index_path_for, BLOCK_SIZE)
+
+        def volume(section_count):
+            return {
+                "filename": "CFA L1 (V1).pdf", "level": "L1", "volume": 1, "total_pages": 300,
+                "pages": [{"page_number": 1, "text": "Cover", "char_count": 5}],
+                "sections": [{"title": f"READING {i}", "parent": None, "page": i * 3 + 1,
+                              "content": f"Section {i} text with ünïcode — {'x' * i}"}
+                             for i in range(section_count)],
+                "formulas": [{"formula": f"PV_{i} = FV / (1 + r)^{i}", "page": i} for i in range(40)]
+            }
+
+        with tempfile.TemporaryDirectory() as tmp:
+            data = volume(3 * BLOCK_SIZE + 5)
+            json_path = os.path.join(tmp, "L1_V1_extracted.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            data_path = os.path.join(tmp, "L1_V1_extracted.jsonl.gz")
+            write_extraction(data, data_path)
+
+            reader = ExtractionReader(data_path)
+            assert reader.section_count == len(data["sections"])
+            for i in (0, BLOCK_SIZE - 2, BLOCK_SIZE, len(data["sections"]) - 1):
+                assert reader.get_section(i) == {"type": "section", **data["sections"][i]}
+            assert [f["formula"] for f in reader.iter_formulas()] == [f["formula"] for f in data["formulas"]]
+            assert load_extraction(data_path) == load_extraction(json_path) == data
+            os.utime(json_path, (1, 1))
+            assert find_extraction(tmp, "L1", 1) == data_path
+            assert find_extraction(tmp, "L1", 2) is None
+            print(f"✓ Seek to section and full load match the JSON output ({reader.section_count} sections)")
+
+            index_path = index_path_for(data_path)
+            os.remove(index_path)
+            assert ExtractionReader(data_path).index == reader.index
+            assert load_extraction(data_path) == data
+
+            # Index left over from an earlier, shorter version of the volume
+            write_extraction(volume(10), data_path)
+            shutil.copy(index_path, os.path.join(tmp, "old.idx.json"))
+            write_extraction(data, data_path)
+            shutil.copy(os.path.join(tmp, "old.idx.json"), index_path)
+            stale = ExtractionReader(data_path)
+            assert stale.section_count == len(data["sections"])
+            assert stale.get_section(BLOCK_SIZE + 1)["title"] == f"READING {BLOCK_SIZE + 1}"
+            print("✓ Missing or stale index is rebuilt from the data file")
+
+        return True
+    except Exception as e:
+        print(f"✗ Extraction store error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_page_cache():
+    """Test that a second extraction is served from the page-text cache."""
+    print("\nTesting page text cache...")
+    try:
+        import tempfile
+        from pdf_extractor import CFAPDFExtractor
+        from page_cache import PageTextCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _make_sample_pdf(os.path.join(tmp, "CFA L1 (V1).pdf"), page_count=30)
+            cache = PageTextCache(os.path.join(tmp, "cache"))
+            extractor = CFAPDFExtractor(tmp, tmp, page_cache=cache)
+
+            first = extractor.process_pdf("CFA L1 (V1).pdf")
+            second = extractor.process_pdf("CFA L1 (V1).pdf")
+            assert first["text_source"] == "pdf"
+            assert second["text_source"] == "page_cache"
+            assert first["sections"] == second["sections"]
+            assert cache.get_page(first["source_sha256"], 2) == first["pages"][1]
+            print("✓ Re-scan from cache matches the PDF extraction")
+
+        return True
+    except Exception as e:
+        print(f"✗ Page cache error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_resumable_extraction():
+    """Test that an interrupted extraction resumes from its checkpoint."""
+    print("\nTesting checkpointed extraction...")
+    try:
+        import tempfile
+        from pdf_extractor import CFAPDFExtractor, file_sha256
+        from extraction_checkpoint import CheckpointStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _make_sample_pdf(os.path.join(tmp, "CFA L1 (V1).pdf"), page_count=120)
+            pdf_hash = file_sha256(os.path.join(tmp, "CFA L1 (V1).pdf"))
+            expected = CFAPDFExtractor(tmp, os.path.join(tmp, "fresh")).process_pdf("CFA L1 (V1).pdf")
+
+            store = CheckpointStore(os.path.join(tmp, "checkpoints"), every=25)
+
+            def crash(page_number):
+                if page_number > 60:
+                    raise RuntimeError("simulated crash")
+
+            extractor = CFAPDFExtractor(tmp, tmp, checkpoints=store)
+            assert extractor.process_pdf("CFA L1 (V1).pdf", progress=crash) is None
+            assert store.load(pdf_hash)["last_page"] == 50
+
+            resumed_pages = []
+            extractor = CFAPDFExtractor(tmp, tmp, checkpoints=store, resume=True)
+            result = extractor.process_pdf("CFA L1 (V1).pdf", progress=resumed_pages.append)
+            assert resumed_pages[0] == 51
+            assert result["sections"] == expected["sections"]
+            assert result["formulas"] == expected["formulas"]
+            assert result["total_chars"] == expected["total_chars"]
+            assert store.load(pdf_hash) is None
+            print("✓ Resumed at page 51 with identical output")
+
+        return True
+    except Exception as e:
+        print(f"✗ Checkpoint error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_extraction_manifest():
+    """Test every outcome of the incremental-extraction manifest check."""
+    print("\nTesting extraction manifest...")
+    try:
+        import tempfile
+        import pdf_extractor
+        from extraction_manifest import (ExtractionManifest, NEW, CHANGED, RULES_CHANGED,
+                                         FORMAT_CHANGED, UNCHANGED, DUPLICATE)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            pdf_path = os.path.join(tmp, "pdfs", "level1", "CFA L1 (V1).pdf")
+            output_path = os.path.join(tmp, "data", "extracted", "L1_V1_extracted.json")
+            os.makedirs(os.path.dirname(pdf_path))
+            os.makedirs(os.path.dirname(output_path))
+            with open(pdf_path, "wb") as f:
+                f.write(b"%PDF original volume")
+            with open(output_path, "w") as f:
+                f.write("{}")
+            result = {"filename": "CFA L1 (V1).pdf", "level": "L1", "volume": 1,
+                      "total_pages": 1, "sections": [], "formulas": []}
+
+            manifest_path = os.path.join(tmp, "data", "extraction_manifest.json")
+            manifest = ExtractionManifest(manifest_path, tmp)
+            assert manifest.check(pdf_path) == NEW
+            manifest.record(pdf_path, result, output_path)
+            manifest.save()
+
+            manifest = ExtractionManifest(manifest_path, tmp)
+            assert manifest.check(pdf_path) == UNCHANGED
+            assert manifest.check(pdf_path, "json") == UNCHANGED
+            assert manifest.check(pdf_path, "jsonl") == FORMAT_CHANGED
+            print("✓ New, unchanged and format-changed files classified")
+
+            # Touched but identical: re-hashed once, then back on the stat-only path
+            stat = os.stat(pdf_path)
+            os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert manifest.check(pdf_path) == UNCHANGED
+            assert manifest.get(pdf_path)["mtime_ns"] == stat.st_mtime_ns + 10**9
+            manifest.save()
+            assert ExtractionManifest(manifest_path, tmp).get(pdf_path)["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+            # Same size, new mtime and different bytes: caught by the content hash
+            with open(pdf_path, "wb") as f:
+                f.write(b"%PDF revised  volume")
+            assert os.path.getsize(pdf_path) == stat.st_size
+            assert manifest.check(pdf_path) == CHANGED
+            manifest.record(pdf_path, result, output_path)
+            assert manifest.check(pdf_path) == UNCHANGED
+            print("✓ Touched-but-identical stays unchanged; edited content is changed")
+
+            entry = manifest.get(pdf_path)
+            entry["rules_version"] = pdf_extractor.RULES_VERSION - 1
+            assert manifest.check(pdf_path) == RULES_CHANGED
+            entry["text_version"] = pdf_extractor.TEXT_VERSION - 1
+            assert manifest.check(pdf_path) == CHANGED
+            manifest.record(pdf_path, result, output_path)
+            os.remove(output_path)
+            assert manifest.check(pdf_path) == CHANGED
+            print("✓ Rule, text-version and missing-output changes detected")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            import contextlib
+            import io
+            from batch_process_pdfs import process_all_levels
+
+            os.makedirs(os.path.join(tmp, "pdfs", "level1"))
+            pdf_path = os.path.join(tmp, "pdfs", "level1", "CFA L1 (V1).pdf")
+            _make_sample_pdf(pdf_path, page_count=12)
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log):
+                process_all_levels(ingest=False, base_dir=tmp)
+                process_all_levels(ingest=False, base_dir=tmp, output_format="jsonl")
+            assert "CFA L1 (V1).pdf: format changed" in log.getvalue()
+            manifest = ExtractionManifest(os.path.join(tmp, "data", "extraction_manifest.json"), tmp)
+            assert manifest.get(pdf_path)["output"].endswith(".jsonl.gz")
+            assert manifest.check(pdf_path, "jsonl") == UNCHANGED
+            print("✓ Batch re-extracts a volume when the output format changes")
+
+            # A byte-identical copy is recorded once, then skipped on the stat check
+            import shutil
+            import batch_process_pdfs
+            copy_path = os.path.join(tmp, "pdfs", "level1", "Copy of CFA L1 (V1).pdf")
+            shutil.copy2(pdf_path, copy_path)
+            hashed = []
+            real_sha256 = batch_process_pdfs.file_sha256
+            batch_process_pdfs.file_sha256 = lambda path: hashed.append(path) or real_sha256(path)
+            try:
+                log = io.StringIO()
+                with contextlib.redirect_stdout(log):
+                    process_all_levels(ingest=False, base_dir=tmp, output_format="jsonl")
+                    first_hashes = list(hashed)
+                    process_all_levels(ingest=False, base_dir=tmp, output_format="jsonl")
+            finally:
+                batch_process_pdfs.file_sha256 = real_sha256
+            assert first_hashes == [copy_path] and hashed == [copy_path]
+            assert log.getvalue().count("duplicate of CFA L1 (V1).pdf, skipped") == 2
+            manifest = ExtractionManifest(os.path.join(tmp, "data", "extraction_manifest.json"), tmp)
+            assert manifest.check(copy_path) == DUPLICATE
+            assert manifest.get(copy_path)["duplicate_of"] == os.path.join("pdfs", "level1", "CFA L1 (V1).pdf")
+
+            os.remove(pdf_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                results = process_all_levels(ingest=False, base_dir=tmp, output_format="jsonl")
+            assert [r["filename"] for r in results] == ["Copy of CFA L1 (V1).pdf"]
+            print("✓ Duplicate files are remembered in the manifest and extracted if the original goes")
+
+        return True
+    except Exception as e:
+        print(f"✗ Manifest error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_content_ingestion():
+    """Test that ingesting the same volume twice does not duplicate rows."""
+    print("\nTesting content ingestion...")
+    try:
+        from database import init_db, SessionLocal
+        from models import CFAContent
+        from services.content_service import ContentService
+
+        init_db()
+        db = SessionLocal()
+        result = {
+            "level": "L9",
+            "volume": 1,
+            "sections": [
+                {"title": "READING 1", "content": "Intro", "page": 1},
+                {"title": "READING 2", "content": "Bonds", "page": 4}
+            ],
+            "formulas": [{"formula": "PV = FV / (1 + r)^n", "page": 5}]
+        }
+
+        service = ContentService(db)
+        service.ingest_extracted([result])
+        service.ingest_extracted([result])
+
+        rows = db.query(CFAContent).filter(CFAContent.level == "L9").all()
+        assert len(rows) == 3
+        formula = [r for r in rows if r.content_type == "formula"][0]
+        assert formula.topic == "READING 2" and formula.page_number == 5
+        print(f"✓ Re-ingestion is idempotent ({len(rows)} rows)")
+
+        db.query(CFAContent).filter(CFAContent.level == "L9").delete()
+        db.commit()
+        db.close()
+        return True
+    except Exception as e:
+        print(f"✗ Ingestion error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_dedup():
+    """Test near-duplicate section detection and cross-volume ingestion skipping."""
+    print("\nTesting duplicate detection...")
+    try:
+        from dedup import page_fingerprint, minhash, jaccard, mark_duplicate_sections, MIN_SIMILARITY
+        from database import init_db, SessionLocal
+        from models import CFAContent, Flashcard
+        from services.content_service import ContentService
+
+        import random
+        vocabulary = ("bond coupon yield duration equity investor value firm cash flow "
+                      "risk return rate price maturity credit spread swap option").split()
+        rng = random.Random(7)
+        body = " ".join(rng.choice(vocabulary) for _ in range(300))
+        other = " ".join(rng.choice(vocabulary) for _ in range(300))
+        assert page_fingerprint("© CFA Institute.\n12") == page_fingerprint("© CFA INSTITUTE. 348")
+        words = body.split()
+        for position, word in ((40, "bonds"), (150, "coupons"), (260, "yields")):
+            words[position] = word
+        edited = " ".join(words)
+        assert jaccard(minhash(f"Bonds\n{body}"), minhash(f"Bonds (reprint)\n{edited}")) >= MIN_SIMILARITY
+        assert jaccard(minhash(body), minhash(other)) < 0.3
+
+        sections = [{"title": "Bonds", "content": body, "page": 1},
+                    {"title": "Equity", "content": other, "page": 5},
+                    {"title": "Bonds", "content": body + " again", "page": 9}]
+        assert mark_duplicate_sections(sections) == 1
+        assert sections[2]["duplicate_of"] == [0] and "duplicate_of" not in sections[1]
+        print("✓ Near-duplicate section flagged")
+
+        init_db()
+        db = SessionLocal()
+        volume_2 = [{"title": "Bonds (reprint)", "content": edited, "page": 1}]
+        mark_duplicate_sections(volume_2)
+        counts = ContentService(db).ingest_extracted([
+            {"level": "L9", "volume": 1, "sections": sections, "formulas": []},
+            {"level": "L9", "volume": 2, "sections": volume_2, "formulas": []}
+        ])
+        assert counts["sections"] == 2 and counts["duplicates"] == 2
+        print(f"✓ Ingestion skipped {counts['duplicates']} duplicate sections")
+
+        # Re-ingesting volume 2 alone still drops its copy of a volume 1 section
+        counts = ContentService(db).ingest_extracted([
+            {"level": "L9", "volume": 2, "sections": volume_2, "formulas": []}
+        ])
+        assert counts["sections"] == 0 and counts["duplicates"] == 1
+        assert db.query(CFAContent).filter(CFAContent.level == "L9").count() == 2
+        print("✓ Re-ingesting one volume is idempotent")
+
+        # Re-runs keep row ids, so linked cards stay linked; dropped rows unlink them
+        stored = db.query(CFAContent).filter(CFAContent.level == "L9").order_by(CFAContent.id).all()
+        assert all(row.minhash for row in stored)  # sketches are stored for later runs
+        ids = [row.id for row in stored]
+        kept = Flashcard(front="Linked", back="card", level="L9", topic="Bonds", content_id=ids[0])
+        dropped = Flashcard(front="Linked", back="card", level="L9", topic="Bonds", content_id=ids[1])
+        db.add_all([kept, dropped])
+        db.commit()
+        ContentService(db).ingest_extracted([{"level": "L9", "volume": 1, "sections": sections, "formulas": []}])
+        assert [row.id for row in db.query(CFAContent.id).filter(
+            CFAContent.level == "L9").order_by(CFAContent.id)] == ids
+        ContentService(db).ingest_extracted([{"level": "L9", "volume": 1, "sections": sections[:1], "formulas": []}])
+        db.expire_all()
+        assert db.query(CFAContent).filter(CFAContent.level == "L9").count() == 1
+        assert kept.content_id == ids[0] and dropped.content_id is None
+        print("✓ Re-ingestion keeps content ids and unlinks cards of dropped sections")
+
+        # Rows stored before sketches were kept get theirs computed and saved
+        db.query(CFAContent).filter(CFAContent.level == "L9").update({"minhash": None})
+        db.commit()
+        counts = ContentService(db).ingest_extracted([
+            {"level": "L9", "volume": 2, "sections": volume_2, "formulas": []}
+        ])
+        assert counts["duplicates"] == 1
+        assert db.query(CFAContent.minhash).filter(CFAContent.id == ids[0]).scalar()
+
+        db.query(Flashcard).filter(Flashcard.level == "L9").delete()
+        db.query(CFAContent).filter(CFAContent.level == "L9").delete()
+        db.commit()
+        db.close()
+        return True
+    except Exception as e:
+        print(f"✗ Dedup error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_formula_index():
+    """Test formula normalization, deduplication and symbol lookup."""
+    print("\nTesting formula index...")
+    try:
+        from formula_index import FormulaIndex
+        from database import init_db, SessionLocal
+        from models import CFAContent
+        from services.content_service import ContentService
+
+        index = FormulaIndex.from_rows([
+            ("PV = FV / (1 + r)^n", "L1", 1, 10, "READING 1"),
+            ("PV=FV/(1+r)^n.", "L1", 2, 33, "READING 9"),
+            ("ModDur = MacDur / (1 + r)", "L1", 2, 40, "READING 10"),
+            ("Sharpe = (Rp − Rf) / σ", "L3", 1, 7, "READING 4")
+        ])
+        assert len(index) == 3
+        pv = index.search("pv")
+        assert len(pv) == 1 and pv[0]["formula"] == "PV = FV/(1 + r)^n"
+        assert len(pv[0]["occurrences"]) == 2
+        assert [f["formula"] for f in index.search("duration")] == ["ModDur = MacDur/(1 + r)"]
+        assert len(index.search("r", level="L1", volume=2)) == 2
+        assert index.search("σ")[0]["formula"] == "Sharpe = (Rp - Rf)/σ"
+        assert index.search(level="L1", volume=1, page=10)[0]["occurrences"][0]["page"] == 10
+        print("✓ Formulas deduplicated and indexed by symbol")
+
+        init_db()
+        db = SessionLocal()
+        ContentService(db).ingest_extracted([{
+            "level": "L9", "volume": 1,
+            "sections": [{"title": "READING 1", "content": "Bonds", "page": 1}],
+            "formulas": [{"formula": "MacDur = 4.5 years", "page": 2}]
+        }])
+        found = ContentService(db).get_formula_index().search("duration", level="L9")
+        assert found and found[0]["occurrences"][0]["topic"] == "READING 1"
+        print("✓ Index rebuilt after ingestion")
+
+        db.query(CFAContent).filter(CFAContent.level == "L9").delete()
+        db.commit()
+        db.close()
+        return True
+    except Exception as e:
+        print(f"✗ Formula index error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_extraction_jobs():
+    """Test that an uploaded PDF is extracted by a background job."""
+    print("\nTesting background extraction jobs...")
+    try:
+        import time
+        import tempfile
+        from fastapi.testclient import TestClient
+        from app import app
+        from extraction_jobs import ExtractionJobManager, DONE, FAILED
+
+        client = TestClient(app)
+        response = client.post("/api/content/upload",
+                               files={"file": ("notes.pdf", b"%PDF-1.4", "application/pdf")})
+        assert response.status_code == 400
+        print("✓ Upload rejects files not named like a volume")
+
+        import app as app_module
+        saved_pdfs_path = app_module.pdfs_path
+        with tempfile.TemporaryDirectory() as tmp:
+            app_module.pdfs_path = tmp
+            try:
+                good_path = os.path.join(tmp, "level1", "CFA L1 (V9).pdf")
+                os.makedirs(os.path.dirname(good_path))
+                _make_sample_pdf(good_path, page_count=2)
+                with open(good_path, "rb") as f:
+                    good_bytes = f.read()
+                response = client.post("/api/content/upload",
+                                       files={"file": ("CFA L1 (V9).pdf", b"not a pdf", "application/pdf")})
+            finally:
+                app_module.pdfs_path = saved_pdfs_path
+            assert response.status_code == 400
+            with open(good_path, "rb") as f:
+                assert f.read() == good_bytes
+            assert os.listdir(os.path.dirname(good_path)) == ["CFA L1 (V9).pdf"]
+        print("✓ A broken upload leaves the existing volume in place")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            level_dir = os.path.join(tmp, "pdfs", "level1")
+            os.makedirs(level_dir)
+            pdf_path = os.path.join(level_dir, "CFA L1 (V7).pdf")
+            _make_sample_pdf(pdf_path, page_count=60)
+
+            manager = ExtractionJobManager(tmp, ingest=False)
+            try:
+                job = manager.submit(pdf_path)
+                assert job["total_pages"] == 60 and job["level"] == "L1"
+                deadline = time.time() + 60
+                while manager.status(job["id"])["status"] not in (DONE, FAILED):
+                    assert time.time() < deadline, "job did not finish"
+                    time.sleep(0.05)
+                job = manager.status(job["id"])
+            finally:
+                manager.shutdown()
+
+            assert job["status"] == DONE, job["error"]
+            assert job["pages_processed"] == 60 and job["percent"] == 100.0
+            assert job["summary"]["section_count"] == 6
+            assert os.path.exists(os.path.join(tmp, "data", "extracted", "L1_V7_extracted.json"))
+            print(f"✓ Job finished in {job['elapsed_seconds']}s")
+
+        return True
+    except Exception as e:
+        print(f"✗ Extraction job error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_pdf_watcher():
+    """Test that the folder watcher reports new PDFs only once they settle."""
+    print("\nTesting PDF folder watcher...")
+    try:
+        import tempfile
+        from pdf_watcher import PdfFolderWatcher
+
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "level1"))
+            existing = os.path.join(tmp, "level1", "CFA L1 (V1).pdf")
+            with open(existing, "wb") as f:
+                f.write(b"%PDF old")
+
+            watcher = PdfFolderWatcher(tmp, ["level1", "level2"], debounce=10)
+            watcher.prime()
+
+            new_pdf = os.path.join(tmp, "level1", "CFA L1 (V2).pdf")
+            with open(new_pdf, "wb") as f:
+                f.write(b"%PDF partial")
+            assert watcher.poll(now=0) == []
+            with open(new_pdf, "ab") as f:
+                f.write(b" still copying")
+            assert watcher.poll(now=8) == []  # changed again: quiet period restarts
+            assert watcher.poll(now=15) == []
+            assert watcher.poll(now=19) == [new_pdf]
+            assert watcher.poll(now=40) == []
+            print("✓ New PDF reported once, after writes settled")
+
+        return True
+    except Exception as e:
+        print(f"✗ Watcher error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_pooled_http_client():
+    """Test that analyzer calls and fallbacks reuse one pooled connection."""
+    print("\nTesting pooled Ollama client...")
+    try:
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        with _FakeOllama(responder=lambda p: f"ok:{p['model']}",
+                         failing={"deepseek-coder:33b"}) as fake:
+            analyzer = HybridContentAnalyzer()
+            try:
+                for _ in range(3):
+                    assert analyzer._call_ollama("hi", "qwen2.5-coder:7b") == "ok:qwen2.5-coder:7b"
+                # Failing model falls back to the next one on the same connection
+                assert analyzer._call_ollama("hi", "deepseek-coder:33b") == "ok:qwen2.5-coder:7b"
+                stats = analyzer.get_statistics()["connections"]
+            finally:
+                analyzer.close()
+
+        assert stats["requests"] == 5 and stats["new_connections"] == 1
+        assert stats["reused_connections"] == 4
+        print(f"✓ {stats['requests']} requests over {stats['new_connections']} connection")
+        return True
+    except Exception as e:
+        print(f"✗ HTTP client error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_model_registry():
+    """Test that the analyzer reads model availability from the shared registry."""
+    print("\nTesting model registry...")
+    try:
+        import time
+        from model_registry import ModelRegistry
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        with _FakeOllama(models=("finance-llm:latest", "qwen2.5-coder:7b")) as fake:
+            os.environ["USE_FINANCE_LLM"] = "true"
+            registry = ModelRegistry(fake.base_url, ttl=60)
+            started = time.perf_counter()
+            analyzer = HybridContentAnalyzer(registry=registry)
+            assert time.perf_counter() - started < 0.5  # constructing never probes
+            assert not analyzer.finance_llm_available
+
+            registry.start()
+            assert registry.wait_until_probed(timeout=5)
+            registry.stop()
+            assert analyzer.finance_llm_available
+            assert analyzer._select_provider("simple", "flashcards") == ("ollama", "finance-llm")
+            assert registry.snapshot()["reachable"]
+        print("✓ Availability served from the background-refreshed registry")
+
+        unreachable = ModelRegistry("http://127.0.0.1:9/v1", probe_timeout=0.5)
+        assert unreachable.probe() is False and not unreachable.has_model("finance-llm")
+        print("✓ Unreachable Ollama degrades to fallback models")
+        return True
+    except Exception as e:
+        print(f"✗ Model registry error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _flashcard_reply(delay=0.0):
+    """Fake-Ollama responder returning two flashcards after ``delay`` seconds."""
+    import json
+    import time
+
+    def respond(payload):
+        time.sleep(delay)
+        return "```json\n" + json.dumps([
+            {"front": "What is PV?", "back": "FV / (1 + r)^n", "difficulty": "easy"},
+            {"front": "What is FV?", "back": "PV * (1 + r)^n", "difficulty": "easy"}
+        ]) + "\n```"
+    return respond
+
+def test_async_generation():
+    """Test that async generation runs concurrent model calls side by side."""
+    print("\nTesting async generation...")
+    try:
+        import time
+        import asyncio
+        from fastapi.testclient import TestClient
+        from app import app, get_analyzer
+        from database import SessionLocal
+        from models import Flashcard
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        with _FakeOllama(responder=_flashcard_reply(delay=0.3)):
+            analyzer = HybridContentAnalyzer()
+
+            async def generate_four():
+                try:
+                    return await asyncio.gather(*[
+                        analyzer.agenerate_flashcards(f"Present value {i}", "TVM", "L1", count=2)
+                        for i in range(4)
+                    ])
+                finally:
+                    await analyzer.aclose()
+
+            started = time.perf_counter()
+            results = asyncio.run(generate_four())
+            elapsed = time.perf_counter() - started
+            assert [len(cards) for cards in results] == [2, 2, 2, 2]
+            assert results[0][0]["level"] == "L1" and results[0][0]["topic"] == "TVM"
+            assert elapsed < 1.0, f"calls ran serially ({elapsed:.2f}s)"
+            print(f"✓ 4 concurrent generations in {elapsed:.2f}s")
+
+            app.dependency_overrides[get_analyzer] = lambda: analyzer
+            try:
+                response = TestClient(app).post("/api/generate/flashcards", json={
+                    "content": "Present value", "topic": "Async TVM test",
+                    "level": "L1", "flashcard_count": 2
+                })
+            finally:
+                app.dependency_overrides.pop(get_analyzer, None)
+            assert response.status_code == 200 and response.json()["count"] == 2
+
+        db = SessionLocal()
+        try:
+            created = db.query(Flashcard).filter(Flashcard.topic == "Async TVM test")
+            assert created.count() == 2
+            created.delete()
+            db.commit()
+        finally:
+            db.close()
+        print("✓ Async endpoint stored the generated flashcards")
+        return True
+    except Exception as e:
+        print(f"✗ Async generation error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_response_cache():
+    """Test that repeated generations are served from the response cache."""
+    print("\nTesting LLM response cache...")
+    try:
+        import time
+        import asyncio
+        import tempfile
+        from llm_cache import ResponseCache
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(os.path.join(tmp, "llm_cache.db"))
+            with _FakeOllama(responder=_flashcard_reply()) as fake:
+                analyzer = HybridContentAnalyzer(cache=cache)
+                try:
+                    first = analyzer.generate_flashcards("Present value", "TVM", "L1", count=2)
+                    again = analyzer.generate_flashcards("Present value", "TVM", "L1", count=2)
+                    async_again = asyncio.run(analyzer.agenerate_flashcards("Present value", "TVM", "L1", count=2))
+                    other = analyzer.generate_flashcards("Present value", "TVM", "L1", count=3)
+                finally:
+                    analyzer.close()
+                assert first == again == async_again and len(first) == 2
+                assert len(fake.calls) == 2 and len(other) == 2
+                stats = analyzer.get_statistics()["cache"]
+                assert stats["hits"] == 2 and stats["misses"] == 2 and stats["entries"] == 2
+            print(f"✓ {stats['hits']} of 4 generations served from cache")
+
+            with _FakeOllama(responder=lambda p: "not json") as fake:
+                analyzer = HybridContentAnalyzer(cache=cache)
+                try:
+                    assert analyzer.generate_flashcards("Bad", "TVM", "L1") == []
+                    assert analyzer.generate_flashcards("Bad", "TVM", "L1") == []
+                finally:
+                    analyzer.close()
+                assert len(fake.calls) == 2
+            print("✓ Malformed replies are not cached")
+
+            with _FakeOllama(responder=_flashcard_reply(), failing={"qwen2.5-coder:7b"}) as fake:
+                analyzer = HybridContentAnalyzer(cache=cache)
+                try:
+                    analyzer.generate_flashcards("Fallback", "TVM", "L1", count=2)
+                    fake.failing = set()
+                    analyzer.health = type(analyzer.health)()  # primary recovered
+                    analyzer.generate_flashcards("Fallback", "TVM", "L1", count=2)
+                finally:
+                    analyzer.close()
+                assert [call["model"] for call in fake.calls][-1] == "qwen2.5-coder:7b"
+            print("✓ Fallback replies are not cached under the routed model")
+
+            # Async callers touch SQLite from worker threads, not the event loop
+            import threading
+            loop_threads = set()
+
+            class _ThreadCheckingCache(ResponseCache):
+                def get(self, key):
+                    loop_threads.add(threading.current_thread() is threading.main_thread())
+                    return super().get(key)
+
+                def put(self, key, response):
+                    loop_threads.add(threading.current_thread() is threading.main_thread())
+                    super().put(key, response)
+
+            checking = _ThreadCheckingCache(os.path.join(tmp, "threads.db"))
+            with _FakeOllama(responder=_flashcard_reply()) as fake:
+                analyzer = HybridContentAnalyzer(cache=checking)
+
+                async def generate_twice():
+                    try:
+                        await analyzer.agenerate_flashcards("Threads", "TVM", "L1", count=2)
+                        items = [item async for item in analyzer.astream_flashcards("Threads", "TVM", "L1", count=2)]
+                        return items
+                    finally:
+                        await analyzer.aclose()
+                try:
+                    assert len(asyncio.run(generate_twice())) == 2
+                finally:
+                    analyzer.close()
+            checking.close()
+            assert loop_threads == {False}
+            print("✓ Async cache lookups and writes run off the event loop")
+            cache.close()
+
+            lru = ResponseCache(os.path.join(tmp, "lru.db"), max_entries=2)
+            lru.put("a", "1")
+            lru.put("b", "2")
+            assert lru.get("a") == "1"
+            lru.put("c", "3")
+            assert lru.get("b") is None and lru.get("a") == "1" and lru.get("c") == "3"
+
+            sized = ResponseCache(os.path.join(tmp, "sized.db"), max_bytes=10)
+            sized.put("a", "x" * 8)
+            sized.put("b", "y" * 8)
+            assert sized.get("a") is None and sized.get("b") == "y" * 8
+
+            expiring = ResponseCache(os.path.join(tmp, "ttl.db"), ttl=0.05)
+            expiring.put("a", "1")
+            time.sleep(0.1)
+            assert expiring.get("a") is None and expiring.stats()["entries"] == 0
+            for c in (lru, sized, expiring):
+                c.close()
+            print("✓ LRU, size and TTL eviction")
+
+            # The app builds its cache on startup, at LLM_CACHE_PATH
+            import app as app_module
+            assert app_module.analyzer.cache is None
+            cache_path = os.path.join(tmp, "app_cache.db")
+            saved_env = {k: os.environ.get(k) for k in ("LLM_CACHE", "LLM_CACHE_PATH")}
+            try:
+                os.environ["LLM_CACHE_PATH"] = cache_path
+                app_cache = app_module.build_response_cache()
+                assert os.path.exists(cache_path)
+                app_cache.close()
+                os.environ["LLM_CACHE"] = "false"
+                assert app_module.build_response_cache() is None
+            finally:
+                for k, v in saved_env.items():
+                    if v is None:
+                        os.environ.pop(k, None)
+                    else:
+                        os.environ[k] = v
+            print("✓ App cache is built on startup at LLM_CACHE_PATH, not on import")
+        return True
+    except Exception as e:
+        print(f"✗ Response cache error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_request_coalescing():
+    """Test that identical concurrent generations share one model call."""
+    print("\nTesting request coalescing...")
+    try:
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        with _FakeOllama(responder=_flashcard_reply(delay=0.3)) as fake:
+            analyzer = HybridContentAnalyzer()
+
+            async def duplicates():
+                try:
+                    with ThreadPoolExecutor(max_workers=1) as pool:
+                        loop = asyncio.get_running_loop()
+                        # A sync caller (thread) and async callers share the call
+                        threaded = loop.run_in_executor(
+                            pool, analyzer.generate_flashcards, "Present value", "TVM", "L1", 2)
+                        await asyncio.sleep(0.05)
+                        results = await asyncio.gather(*[
+                            analyzer.agenerate_flashcards("Present value", "TVM", "L1", count=2)
+                            for _ in range(3)
+                        ])
+                        return [await threaded] + results
+                finally:
+                    await analyzer.aclose()
+                    analyzer.close()
+
+            results = asyncio.run(duplicates())
+            assert len(fake.calls) == 1, f"{len(fake.calls)} model calls"
+            assert all(cards == results[0] and len(cards) == 2 for cards in results)
+            results[1][0]["front"] = "changed"
+            assert results[2][0]["front"] == "What is PV?"  # each caller gets its own copy
+            assert analyzer.get_statistics()["coalesced_requests"] == 3
+            assert not analyzer._inflight
+        print("✓ 4 identical requests made 1 model call")
+
+        with _FakeOllama(failing={"qwen2.5-coder:7b", "deepseek-coder:33b", "llama3:8b"}) as fake:
+            analyzer = HybridContentAnalyzer()
+
+            async def failing():
+                try:
+                    return await asyncio.gather(*[
+                        analyzer.agenerate_flashcards("Present value", "TVM", "L1", count=2)
+                        for _ in range(3)
+                    ])
+                finally:
+                    await analyzer.aclose()
+
+            assert asyncio.run(failing()) == [[], [], []]
+            assert len(fake.calls) == 3 and not analyzer._inflight  # one walk of the fallbacks
+        print("✓ Failures propagate to every waiter")
+
+        from content_analyzer_hybrid import Deadline, DeadlineExceeded
+        with _FakeOllama(responder=_flashcard_reply(delay=0.3)) as fake:
+            analyzer = HybridContentAnalyzer()
+
+            async def leader_times_out():
+                try:
+                    with ThreadPoolExecutor(max_workers=1) as pool:
+                        loop = asyncio.get_running_loop()
+                        leader = asyncio.ensure_future(analyzer.agenerate_flashcards(
+                            "Present value", "TVM", "L1", count=2, deadline=Deadline(0.1)))
+                        await asyncio.sleep(0.02)
+                        # Waiters without a deadline, with budget left and with too little
+                        threaded = loop.run_in_executor(
+                            pool, analyzer.generate_flashcards, "Present value", "TVM", "L1", 2)
+                        patient = analyzer.agenerate_flashcards(
+                            "Present value", "TVM", "L1", count=2, deadline=Deadline(5))
+                        hasty = analyzer.agenerate_flashcards(
+                            "Present value", "TVM", "L1", count=2, deadline=Deadline(0.2))
+                        return await asyncio.gather(leader, threaded, patient, hasty,
+                                                    return_exceptions=True)
+                finally:
+                    await analyzer.aclose()
+                    analyzer.close()
+
+            leader, threaded, patient, hasty = asyncio.run(leader_times_out())
+            assert isinstance(leader, DeadlineExceeded) and isinstance(hasty, DeadlineExceeded)
+            assert len(threaded) == 2 and patient == threaded
+            assert len(fake.calls) == 2 and not analyzer._inflight
+        print("✓ Waiters with budget left retry after the first caller's deadline")
+        return True
+    except Exception as e:
+        print(f"✗ Request coalescing error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_chunked_generation():
+    """Test that long content is chunked, generated in parallel and merged."""
+    print("\nTesting chunked generation...")
+    try:
+        import re
+        import json
+        import time
+        import asyncio
+        from content_chunker import chunk_content, distribute_count, estimate_tokens, merge_items
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        sections = []
+        for n in range(1, 4):
+            paragraphs = [f"Reading {n} Portfolio Topic {n}"]
+            paragraphs += [f"Topic {n} paragraph {p}. " + "Returns compound over time. " * 20
+                           for p in range(6)]
+            sections.append("\n\n".join(paragraphs))
+        content = "\n\n".join(sections)
+
+        chunks = chunk_content(content, max_tokens=1000)
+        assert len(chunks) >= 3 and all(estimate_tokens(c) <= 1000 for c in chunks)
+        assert all(any(f"Reading {n} " in c.split("\n", 1)[0] for c in chunks) for n in range(1, 4))
+        assert re.sub(r"\s+", "", "".join(chunks)) == re.sub(r"\s+", "", content)
+        assert distribute_count(10, [3, 1, 1]) == [6, 2, 2]
+        assert distribute_count(2, [1, 5, 3]) == [0, 1, 1]
+        assert len(merge_items([[{"front": "What is PV?"}], [{"front": "what is  PV"}]], "front")) == 1
+        print(f"✓ {len(content)} chars → {len(chunks)} chunks on section boundaries")
+
+        def respond(payload):
+            time.sleep(0.3)
+            prompt = payload["messages"][0]["content"]
+            count = int(re.search(r"generate (\d+) high-quality", prompt).group(1))
+            topics = sorted(set(re.findall(r"Topic (\d+) paragraph", prompt)))
+            return json.dumps([{"front": f"Topics {'/'.join(topics)} card {i}", "back": "..."}
+                               for i in range(count)])
+
+        os.environ["OLLAMA_PARALLEL_CHUNKS"] = "8"
+        try:
+            with _FakeOllama(responder=respond) as fake:
+                analyzer = HybridContentAnalyzer()
+
+                async def generate():
+                    try:
+                        return await analyzer.agenerate_flashcards(content, "Portfolio", "L1", count=9)
+                    finally:
+                        await analyzer.aclose()
+
+                started = time.perf_counter()
+                cards = asyncio.run(generate())
+                elapsed = time.perf_counter() - started
+        finally:
+            os.environ.pop("OLLAMA_PARALLEL_CHUNKS", None)
+
+        assert len(fake.calls) == len(chunks) and len(cards) == 9
+        assert {"1", "2", "3"} <= set(re.findall(r"\d", " ".join(c["front"].split(" card")[0] for c in cards)))
+        assert elapsed < 0.3 * len(chunks), f"chunks ran serially ({elapsed:.2f}s)"
+        print(f"✓ 9 cards from all {len(chunks)} chunks in {elapsed:.2f}s")
+        return True
+    except Exception as e:
+        print(f"✗ Chunked generation error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_streaming_generation():
+    """Test incremental JSON parsing and the SSE generation endpoint."""
+    print("\nTesting streaming generation...")
+    try:
+        import json
+        import time
+        import asyncio
+        from fastapi.testclient import TestClient
+        from app import app, get_analyzer
+        from database import SessionLocal
+        from models import Flashcard
+        from json_stream import JsonArrayParser
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        reply = ('```json\n[{"front": "Is }, a brace?", "back": "Yes \\"quoted\\"", "tags": ["a", "b"]},\n'
+                 ' {"front": broken},\n {"front": "PV?", "back": "FV / (1 + r)^n"}]\n``` trailing text')
+        parser = JsonArrayParser()
+        items = [item for ch in reply for item in parser.feed(ch)]
+        assert [item["front"] for item in items] == ["Is }, a brace?", "PV?"]
+        assert items[0]["tags"] == ["a", "b"] and parser.skipped == 1 and parser.done
+        print("✓ Parser yields elements as they complete and skips malformed ones")
+
+        cards = [{"front": f"Card {i}", "back": "x" * 200} for i in range(3)]
+        with _FakeOllama(responder=lambda p: json.dumps(cards), stream_delay=0.02):
+            analyzer = HybridContentAnalyzer()
+
+            async def consume(stream):
+                started, arrivals = time.perf_counter(), []
+                async for item in stream:
+                    arrivals.append((time.perf_counter() - started, item))
+                return arrivals
+
+            async def first_run():
+                try:
+                    return await consume(analyzer.astream_flashcards("Present value", "TVM", "L1", count=3))
+                finally:
+                    await analyzer.aclose()
+
+            arrivals = asyncio.run(first_run())
+            assert [item["front"] for _, item in arrivals] == ["Card 0", "Card 1", "Card 2"]
+            assert arrivals[0][1]["topic"] == "TVM"
+            assert arrivals[0][0] < arrivals[-1][0] / 2, "first card waited for the whole reply"
+            print(f"✓ First card after {arrivals[0][0]:.2f}s, last after {arrivals[-1][0]:.2f}s")
+
+        cut_off = '[{"front": "Kept", "back": "salvaged"}, {"front": "Lost", "ba'
+        with _FakeOllama(responder=lambda p: cut_off):
+            analyzer = HybridContentAnalyzer()
+
+            async def truncated():
+                try:
+                    return [item async for item in analyzer.astream_flashcards("Bonds", "FI", "L1", count=2)]
+                finally:
+                    await analyzer.aclose()
+
+            assert [item["front"] for item in asyncio.run(truncated())] == ["Kept"]
+        print("✓ A truncated reply keeps its complete cards")
+
+        with _FakeOllama(responder=lambda p: json.dumps(cards[:2])):
+            analyzer = HybridContentAnalyzer()
+            app.dependency_overrides[get_analyzer] = lambda: analyzer
+            try:
+                response = TestClient(app).post("/api/generate/flashcards/stream", json={
+                    "content": "Present value", "topic": "Streaming TVM test",
+                    "level": "L1", "flashcard_count": 2
+                })
+            finally:
+                app.dependency_overrides.pop(get_analyzer, None)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+        names = [lines[0][len("event: "):] for lines in events]
+        assert names == ["item", "item", "done"], names
+        assert json.loads(events[-1][1][len("data: "):])["count"] == 2
+
+        db = SessionLocal()
+        try:
+            created = db.query(Flashcard).filter(Flashcard.topic == "Streaming TVM test")
+            assert created.count() == 2
+            created.delete()
+            db.commit()
+        finally:
+            db.close()
+        print("✓ SSE endpoint stored and reported each card")
+        return True
+    except Exception as e:
+        print(f"✗ Streaming generation error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_model_health():
+    """Test circuit breakers and health-ordered fallbacks."""
+    print("\nTesting model health routing...")
+    try:
+        from model_health import ModelHealth, OPEN, HALF_OPEN, CLOSED
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        health = ModelHealth(failure_threshold=2, cooldown=10)
+        health.record_success("slow", 2.0)
+        health.record_success("fast", 0.5)
+        assert health.order("main", ["slow", "new", "fast"], now=0) == ["main", "fast", "slow", "new"]
+
+        health.record_failure("main", 0.1, "boom", now=0)
+        assert health.order("main", ["fast"], now=0)[0] == "main"
+        health.record_failure("main", 0.1, "boom", now=0)
+        assert health.snapshot()["main"]["state"] == OPEN
+        assert health.order("main", ["fast"], now=5) == ["fast"]
+        assert health.snapshot()["main"]["skipped"] == 0  # order() only reads
+        assert health.allow("main", now=11) and not health.allow("main", now=11)
+        assert health.snapshot()["main"]["state"] == HALF_OPEN
+        health.record_failure("main", 0.1, "still down", now=11)
+        assert health.order("main", [], now=25) == []  # cooldown doubled to 20s
+        assert health.allow("main", now=31)
+        health.record_success("main", 0.2)
+        assert health.snapshot()["main"]["state"] == CLOSED
+        print("✓ Breaker opens, half-opens for one trial and closes")
+
+        with _FakeOllama(responder=lambda p: f"ok:{p['model']}",
+                         failing={"qwen2.5-coder:7b"}) as fake:
+            analyzer = HybridContentAnalyzer()
+            try:
+                for _ in range(5):
+                    assert analyzer._call_ollama("hi", "qwen2.5-coder:7b") == "ok:deepseek-coder:33b"
+                analyzer._all_failed("qwen2.5-coder:7b")  # must not count another skip
+            finally:
+                analyzer.close()
+        tried = [call["model"] for call in fake.calls]
+        assert tried.count("qwen2.5-coder:7b") == 3 and tried.count("deepseek-coder:33b") == 5
+        models = analyzer.get_statistics()["models"]
+        assert models["qwen2.5-coder:7b"]["state"] == OPEN and models["qwen2.5-coder:7b"]["skipped"] == 2
+        print("✓ Failing model skipped after 3 errors")
+        return True
+    except Exception as e:
+        print(f"✗ Model health error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_generation_deadline():
+    """Test that generation stops at the request deadline with partial results or 504."""
+    print("\nTesting generation deadline...")
+    try:
+        import json
+        import time
+        import asyncio
+        from fastapi.testclient import TestClient
+        from app import app, get_analyzer
+        from database import SessionLocal
+        from models import Flashcard
+        from content_analyzer_hybrid import HybridContentAnalyzer, Deadline, DeadlineExceeded
+
+        def respond(payload):
+            prompt = payload["messages"][0]["content"]
+            if "Slow reading" in prompt:
+                time.sleep(1.5)
+            return json.dumps([{"front": "Fast card", "back": "Done in time"}])
+
+        slow = "Slow reading. " * 300
+        fast = "Fast reading. " * 300
+        with _FakeOllama(responder=respond) as fake:
+            analyzer = HybridContentAnalyzer()
+            try:
+                started = time.perf_counter()
+                try:
+                    analyzer.generate_flashcards(slow, "TVM", "L1", count=2, deadline=Deadline(0.3))
+                    raise AssertionError("deadline not enforced")
+                except DeadlineExceeded:
+                    pass
+                assert time.perf_counter() - started < 1.0
+                assert len(fake.calls) == 1  # no fallback started after the budget ran out
+                assert all(m["failures"] == 0 for m in analyzer.health.snapshot().values())
+                print("✓ Sync call stops at the deadline without trying fallbacks")
+
+                app.dependency_overrides[get_analyzer] = lambda: analyzer
+                client = TestClient(app)
+                started = time.perf_counter()
+                response = client.post("/api/generate/flashcards", json={
+                    "content": slow, "topic": "Deadline test", "level": "L1",
+                    "flashcard_count": 2, "deadline_seconds": 0.3
+                })
+                assert response.status_code == 504, response.status_code
+                assert time.perf_counter() - started < 1.0
+                print("✓ Endpoint answers 504 when nothing finished in time")
+
+                os.environ["OLLAMA_CHUNK_TOKENS"] = "1000"
+                response = client.post("/api/generate/flashcards", json={
+                    "content": fast + "\n\n" + slow, "topic": "Deadline test", "level": "L1",
+                    "flashcard_count": 2, "deadline_seconds": 0.5
+                })
+                result = response.json()
+                assert response.status_code == 200 and result["partial"] and result["count"] == 1
+                print("✓ Finished chunks are returned as a partial result")
+
+                # One chunk times out, the other cannot connect: still a timeout
+                import httpx
+
+                async def timeout_or_refuse(prompt, complexity, task_type, max_tokens, deadline):
+                    if "Slow reading" in prompt:
+                        await asyncio.sleep(deadline.remaining())
+                        deadline.check()
+                    raise httpx.ConnectError("connection refused")
+                analyzer._agenerate = timeout_or_refuse
+                response = client.post("/api/generate/flashcards", json={
+                    "content": slow + "\n\n" + "Broken reading. " * 300, "topic": "Deadline test",
+                    "level": "L1", "flashcard_count": 2, "deadline_seconds": 0.3
+                })
+                assert response.status_code == 504, response.status_code
+                print("✓ A timed-out chunk beside a failed one still answers 504")
+            finally:
+                app.dependency_overrides.pop(get_analyzer, None)
+                os.environ.pop("OLLAMA_CHUNK_TOKENS", None)
+                analyzer.close()
+
+        db = SessionLocal()
+        try:
+            db.query(Flashcard).filter(Flashcard.topic == "Deadline test").delete()
+            db.commit()
+        finally:
+            db.close()
+        return True
+    except Exception as e:
+        print(f"✗ Generation deadline error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_bundle_generation():
+    """Test that flashcards, questions and concepts come from one model call."""
+    print("\nTesting bundle generation...")
+    try:
+        import json
+        from fastapi.testclient import TestClient
+        from app import app, get_analyzer
+        from database import SessionLocal
+        from models import Flashcard, QuizQuestion
+        from content_analyzer_hybrid import HybridContentAnalyzer
+
+        bundle = {
+            "flashcards": [{"front": "What is PV?", "back": "FV / (1 + r)^n"},
+                           {"front": "What is FV?", "back": "PV * (1 + r)^n"}],
+            "questions": [{"question": "PV of $110 in 1 year at 10%?", "option_a": "$100",
+                           "option_b": "$110", "option_c": "$121", "correct_answer": "A",
+                           "explanation": "110 / 1.1 = 100"},
+                          {"question": "Incomplete question"}],
+            "concepts": {"key_concepts": ["Discounting"], "formulas": [{"formula": "PV = FV / (1 + r)^n"}]}
+        }
+        with _FakeOllama(responder=lambda p: "```json\n" + json.dumps(bundle) + "\n```") as fake:
+            analyzer = HybridContentAnalyzer()
+            try:
+                result = analyzer.generate_bundle("Present value", "TVM", "L1", flashcard_count=2, question_count=2)
+                assert len(fake.calls) == 1
+                prompt = fake.calls[0]["messages"][0]["content"]
+                assert prompt.count("Present value") == 1 and "2 flashcards and 2 questions" in prompt
+                assert len(result["flashcards"]) == 2 and result["questions"][0]["topic"] == "TVM"
+                assert result["concepts"]["key_concepts"] == ["Discounting"]
+                print("✓ One prompt produced flashcards, questions and concepts")
+
+                app.dependency_overrides[get_analyzer] = lambda: analyzer
+                response = TestClient(app).post("/api/generate/bundle", json={
+                    "content": "Bundle content", "topic": "Bundle test", "level": "L1",
+                    "flashcard_count": 2, "question_count": 2
+                })
+            finally:
+                app.dependency_overrides.pop(get_analyzer, None)
+                analyzer.close()
+        data = response.json()
+        assert response.status_code == 200 and len(fake.calls) == 2
+        assert data["flashcard_count"] == 2 and data["question_count"] == 1  # incomplete one skipped
+        assert data["concepts"]["formulas"][0]["formula"] == "PV = FV / (1 + r)^n"
+
+        db = SessionLocal()
+        try:
+            for model in (Flashcard, QuizQuestion):
+                rows = db.query(model).filter(model.topic == "Bundle test")
+                assert rows.count() == (2 if model is Flashcard else 1)
+                rows.delete()
+            db.commit()
+        finally:
+            db.close()
+        print("✓ Bundle endpoint stored cards and questions from one call")
+
+        class _RejectingAnalyzer:
+            async def agenerate_bundle(self, *args):
+                raise ValueError("ContentAnalyzer not initialized")
+
+        app.dependency_overrides[get_analyzer] = _RejectingAnalyzer
+        try:
+            response = TestClient(app).post("/api/generate/bundle", json={
+                "content": "Bundle content", "topic": "Bundle test", "level": "L1"
+            })
+        finally:
+            app.dependency_overrides.pop(get_analyzer, None)
+        assert response.status_code == 400 and response.json()["detail"] == "ContentAnalyzer not initialized"
+        print("✓ Bundle endpoint answers 400 for invalid requests")
+        return True
+    except Exception as e:
+        print(f"✗ Bundle generation error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def test_generation_queue():
+    """Test job priorities, retries, restart recovery and the job endpoints."""
+    print("\nTesting generation queue...")
+    try:
+        import time
+        import tempfile
+        import threading
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from fastapi.testclient import TestClient
+        from app import app, get_generation_queue
+        from database import Base
+        from models import Flashcard, GenerationJob
+        from content_analyzer_hybrid import HybridContentAnalyzer
+        from datetime import datetime, timedelta
+        from generation_queue import (GenerationQueue, QUEUED, RUNNING, DONE, FAILED, store_bundle,
+                                      usable_result)
+
+        def wait_for(queue, job_id, statuses, timeout=10):
+            end = time.time() + timeout
+            while time.time() < end:
+                job = queue.status(job_id)
+                if job["status"] in statuses:
+                    return job
+                time.sleep(0.05)
+            raise AssertionError(f"job {job_id} stuck in {job['status']}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'jobs.db')}",
+                                   connect_args={"check_same_thread": False})
+            Base.metadata.create_all(bind=engine)
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+            lock = threading.Lock()
+            replies = _flashcard_reply()
+            broken = {"Retry"}  # topics whose first call returns garbage
+
+            def respond(payload):
+                prompt = payload["messages"][0]["content"]
+                with lock:
+                    for topic in list(broken):
+                        if f'topic of "{topic}"' in prompt:
+                            broken.discard(topic)
+                            return "not json"
+                return replies(payload)
+
+            with _FakeOllama(responder=respond) as fake:
+                analyzer = HybridContentAnalyzer()
+                queue = GenerationQueue(factory, analyzer, workers=1, max_attempts=2,
+                                        retry_delay=0, poll_interval=0.05)
+                try:
+                    bulk = queue.submit("flashcards", "Bulk content", "Bulk", "L1", flashcard_count=2)
+                    urgent = queue.submit("flashcards", "Urgent content", "Urgent", "L1",
+                                          priority="interactive", flashcard_count=2)
+                    assert urgent["queue_position"] == 0 and queue.status(bulk["id"])["queue_position"] == 1
+
+                    # A job claimed by a live process keeps its lease and is not requeued
+                    assert queue._claim()[0] == urgent["id"]
+                    assert queue.status(urgent["id"])["status"] == RUNNING
+                    assert queue.recover() == 0
+
+                    # Its process crashes: the lease lapses and the next start requeues it
+                    db = factory()
+                    try:
+                        db.query(GenerationJob).filter(GenerationJob.id == urgent["id"]).update(
+                            {"lease_until": datetime.utcnow() - timedelta(seconds=1)})
+                        db.commit()
+                    finally:
+                        db.close()
+                    queue.start()
+                    for job in (urgent, bulk):
+                        assert wait_for(queue, job["id"], (DONE, FAILED))["status"] == DONE
+                    prompts = [call["messages"][0]["content"] for call in fake.calls]
+                    assert "Urgent" in prompts[0] and "Bulk" in prompts[1]
+                    assert queue.status(urgent["id"])["result"]["flashcard_count"] == 2
+                    print("✓ Interactive job ran before bulk; job with an expired lease requeued")
+
+                    retried = queue.submit("flashcards", "Retry content", "Retry", "L1", flashcard_count=2)
+                    job = wait_for(queue, retried["id"], (DONE, FAILED))
+                    assert job["status"] == DONE and job["attempts"] == 2
+                    fake.failing = {"qwen2.5-coder:7b", "deepseek-coder:33b", "llama3:8b"}
+                    doomed = queue.submit("quiz", "Doomed content", "Doomed", "L1", question_count=1)
+                    job = wait_for(queue, doomed["id"], (DONE, FAILED))
+                    assert job["status"] == FAILED and job["attempts"] == 2 and job["error"]
+                    print("✓ Failed generation retried, then given up after max attempts")
+
+                    # An error outside the generation requeues the job instead of leaving it running
+                    fake.failing = set()
+                    real_run = queue._run
+
+                    def crashing_run(job_id, token):
+                        queue._run = real_run
+                        raise RuntimeError("database is locked")
+                    queue._run = crashing_run
+                    crashed = queue.submit("flashcards", "Crashed content", "Crashed", "L1", flashcard_count=2)
+                    job = wait_for(queue, crashed["id"], (DONE, FAILED))
+                    assert job["status"] == DONE and job["attempts"] == 2
+                    print("✓ Worker errors retry the job instead of leaving it running")
+
+                    queue.shutdown()  # jobs submitted below stay queued
+                    app.dependency_overrides[get_generation_queue] = lambda: queue
+                    client = TestClient(app)
+                    response = client.post("/api/generate/jobs", json={
+                        "kind": "sonnet", "content": "x", "topic": "x", "level": "L1"})
+                    assert response.status_code == 400
+                    response = client.post("/api/generate/jobs", json={
+                        "kind": "flashcards", "content": "x", "topic": "x", "level": "L1"})
+                    assert response.status_code == 202 and response.json()["job"]["priority"] == "bulk"
+                    listing = client.get("/api/generate/jobs").json()
+                    assert listing["counts"] == {QUEUED: 1, RUNNING: 0, DONE: 4, FAILED: 1} and listing["jobs"][0]["id"] == response.json()["job"]["id"]
+                    assert client.get(f"/api/generate/jobs/{doomed['id']}").json()["status"] == FAILED
+                    assert client.get("/api/generate/jobs/999999").status_code == 404
+
+                    # A second process renews the lease of the job it runs; ours leaves it alone
+                    other = GenerationQueue(factory, analyzer, lease_seconds=60)
+                    job_id, token = other._claim()
+                    other._running[job_id] = token
+                    db = factory()
+                    try:
+                        lease = lambda: db.query(GenerationJob.lease_until).filter(
+                            GenerationJob.id == job_id).scalar()
+                        first_lease = lease()
+                        time.sleep(0.01)
+                        other._renew_leases()
+                        db.expire_all()
+                        assert lease() > first_lease and queue.recover() == 0
+                        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(
+                            {"lease_until": datetime.utcnow() - timedelta(seconds=1)})
+                        db.commit()
+                        assert queue.recover() == 1
+
+                        # A run whose lease lapsed and whose job was claimed again stores nothing
+                        stale = other._claim()
+                        db.query(GenerationJob).filter(GenerationJob.id == job_id).update(
+                            {"lease_until": datetime.utcnow() - timedelta(seconds=1)})
+                        db.commit()
+                        assert queue.recover() == 1
+                        fresh = other._claim()
+                        assert fresh[0] == stale[0] == job_id and fresh[1] != stale[1]
+                        other._run(*stale)
+                        other._abandon(*stale, RuntimeError("late failure"))
+                        assert queue.status(job_id)["status"] == RUNNING and queue.status(job_id)["error"] is None
+                        assert db.query(Flashcard).filter(Flashcard.topic == "x").count() == 0
+                        other._run(*fresh)
+                        assert queue.status(job_id)["status"] == DONE
+                        assert db.query(Flashcard).filter(Flashcard.topic == "x").count() == 2
+                    finally:
+                        db.close()
+                    print("✓ Leases are renewed, and a run that lost its lease records nothing")
+                finally:
+                    app.dependency_overrides.pop(get_generation_queue, None)
+                    queue.shutdown()
+                    analyzer.close()
+
+            db = factory()
+            try:
+                assert db.query(Flashcard).filter(Flashcard.topic.in_(["Urgent", "Bulk", "Retry"])).count() == 6
+                assert db.query(GenerationJob).filter(GenerationJob.status == QUEUED).count() == 0
+
+                # A bundle's flashcards and questions are stored together or not at all
+                card = {"front": "Atomic?", "back": "Yes", "level": "L1", "topic": "Atomic"}
+                question = {"question": "Q?", "option_a": "A", "option_b": "B", "option_c": "C",
+                            "correct_answer": "A", "explanation": "E", "topic": "Atomic"}  # no level
+                try:
+                    store_bundle(db, {"flashcards": [card], "questions": [question], "concepts": {}})
+                    raise AssertionError("incomplete question stored")
+                except KeyError:
+                    pass
+                assert db.query(Flashcard).filter(Flashcard.topic == "Atomic").count() == 0
+            finally:
+                db.close()
+            engine.dispose()
+
+            assert usable_result("bundle", {"flashcard_count": 0, "question_count": 0,
+                                            "concepts": {"key_concepts": ["Duration"], "topic": "x"}})
+            assert not usable_result("bundle", {"flashcard_count": 0, "question_count": 0,
+                                                "concepts": {"key_concepts": [], "topic": "x"}})
+            assert not usable_result("flashcards", {"flashcard_count": 0})
+        print("✓ Job endpoints queue, list and report jobs")
+        return True
+    except Exception as e:
+        print(f"✗ Generation queue error: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
 def run_all_tests():
     """Run all tests."""
     print("=" * 60)
@@ -148,6 +1783,29 @@ def run_all_tests():
     results.append(("Models", test_models()))
     results.append(("Services", test_services()))
     results.append(("API", test_api_health()))
+    results.append(("Parallel batch", test_parallel_batch()))
+    results.append(("Sharding", test_pdf_sharding()))
+    results.append(("Sectioning", test_toc_sectioning()))
+    results.append(("JSONL store", test_extraction_store()))
+    results.append(("Page cache", test_page_cache()))
+    results.append(("Resume", test_resumable_extraction()))
+    results.append(("Manifest", test_extraction_manifest()))
+    results.append(("Ingestion", test_content_ingestion()))
+    results.append(("Dedup", test_dedup()))
+    results.append(("Formula index", test_formula_index()))
+    results.append(("Upload jobs", test_extraction_jobs()))
+    results.append(("PDF watcher", test_pdf_watcher()))
+    results.append(("HTTP pooling", test_pooled_http_client()))
+    results.append(("Model registry", test_model_registry()))
+    results.append(("Async generation", test_async_generation()))
+    results.append(("Response cache", test_response_cache()))
+    results.append(("Request coalescing", test_request_coalescing()))
+    results.append(("Chunked generation", test_chunked_generation()))
+    results.append(("Streaming generation", test_streaming_generation()))
+    results.append(("Model health", test_model_health()))
+    results.append(("Generation deadline", test_generation_deadline()))
+    results.append(("Bundle generation", test_bundle_generation()))
+    results.append(("Generation queue", test_generation_queue()))
 
     print("\n" + "=" * 60)
     print("Test Summary")
@@ -513,6 +513,50 @@ async function showLevelProgress(level) {
 }
 
 // Content Generation
+
+// POST a generation request and read its Server-Sent Events stream,
+// calling onItem for every stored card/question. Resolves with the final
+// "done" payload; rejects on an "error" event or HTTP error.
+async function streamGeneration(path, body, onItem) {
+    const response = await fetch(`${API_BASE}${path}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok) {
+        const result = await response.json();
+        throw new Error(result.detail || response.statusText);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let done = null;
+
+    while (true) {
+        const { value, done: finished } = await reader.read();
+        if (finished) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            const payload = data ? JSON.parse(data) : {};
+            if (event === 'item') onItem(payload);
+            else if (event === 'done') done = payload;
+            else if (event === 'error') throw new Error(payload.detail);
+        }
+    }
+    return done || { count: 0, message: 'Generation ended early' };
+}
+
 async function generateFlashcards() {
     const level = document.getElementById('gen-level').value;
     const topic = document.getElementById('gen-topic').value;
@@ -525,31 +569,23 @@ async function generateFlashcards() {
     }
 
     showLoading(true);
-    showGenerationStatus('Generating flashcards with Claude AI...', 'success');
+    showGenerationStatus('Generating flashcards...', 'success');
 
     try {
-        const response = await fetch(`${API_BASE}/api/generate/flashcards`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                level,
-                topic,
-                content,
-                flashcard_count: parseInt(count)
-            })
+        const result = await streamGeneration('/api/generate/flashcards/stream', {
+            level,
+            topic,
+            content,
+            flashcard_count: parseInt(count)
+        }, item => {
+            showGenerationStatus(`Generated ${item.count}/${count} flashcards: ${item.front}`, 'success');
         });
 
-        const result = await response.json();
-
-        if (response.ok) {
-            showGenerationStatus(`✅ ${result.message}`, 'success');
-            loadFlashcardStats();
-        } else {
-            showGenerationStatus(`❌ Error: ${result.detail}`, 'error');
-        }
+        showGenerationStatus(`✅ ${result.message}${result.partial ? ' (stopped at the time limit)' : ''}`, 'success');
+        loadFlashcardStats();
 
     } catch (error) {
-        showGenerationStatus('❌ Error generating flashcards. Make sure ANTHROPIC_API_KEY is set.', 'error');
+        showGenerationStatus(`❌ Error generating flashcards: ${error.message}. Make sure Ollama is running.`, 'error');
         console.error(error);
     } finally {
         showLoading(false);
@@ -568,44 +604,76 @@ async function generateQuiz() {
     }
 
     showLoading(true);
-    showGenerationStatus('Generating quiz questions with Claude AI...', 'success');
+    showGenerationStatus('Generating quiz questions...', 'success');
 
     try {
-        const response = await fetch(`${API_BASE}/api/generate/quiz`, {
+        const result = await streamGeneration('/api/generate/quiz/stream', {
+            level,
+            topic,
+            content,
+            question_count: parseInt(count)
+        }, item => {
+            showGenerationStatus(`Generated ${item.count}/${count} questions`, 'success');
+        });
+
+        showGenerationStatus(`✅ ${result.message}${result.partial ? ' (stopped at the time limit)' : ''}`, 'success');
+        loadQuizStats();
+
+    } catch (error) {
+        showGenerationStatus(`❌ Error generating quiz: ${error.message}. Make sure Ollama is running.`, 'error');
+        console.error(error);
+    } finally {
+        showLoading(false);
+    }
+}
+
+// One request (and one model pass over the content) for flashcards and quiz
+async function generateBoth() {
+    const level = document.getElementById('gen-level').value;
+    const topic = document.getElementById('gen-topic').value;
+    const content = document.getElementById('gen-content').value;
+    const flashcardCount = document.getElementById('gen-flashcard-count').value;
+    const questionCount = document.getElementById('gen-quiz-count').value;
+
+    if (!topic || !content) {
+        showGenerationStatus('Please fill in all fields', 'error');
+        return;
+    }
+
+    showLoading(true);
+    showGenerationStatus('Generating flashcards and quiz questions...', 'success');
+
+    try {
+        const response = await fetch(`${API_BASE}/api/generate/bundle`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
                 level,
                 topic,
                 content,
-                question_count: parseInt(count)
+                flashcard_count: parseInt(flashcardCount),
+                question_count: parseInt(questionCount)
             })
         });
 
         const result = await response.json();
 
         if (response.ok) {
-            showGenerationStatus(`✅ ${result.message}`, 'success');
+            showGenerationStatus(`✅ ${result.message}${result.partial ? ' (stopped at the time limit)' : ''}`, 'success');
+            loadFlashcardStats();
             loadQuizStats();
         } else {
             showGenerationStatus(`❌ Error: ${result.detail}`, 'error');
         }
 
     } catch (error) {
-        showGenerationStatus('❌ Error generating quiz. Make sure ANTHROPIC_API_KEY is set.', 'error');
+        showGenerationStatus('❌ Error generating content. Make sure Ollama is running.', 'error');
         console.error(error);
     } finally {
         showLoading(false);
     }
 }
 
-async function generateBoth() {
-    showLoading(true);
-    await generateFlashcards();
-    await generateQuiz();
-    showLoading(false);
-}
-
 function showGenerationStatus(message, type) {
     const statusDiv = document.getElementById('generation-status');
     statusDiv.textContent = message;